@@ -0,0 +1,389 @@
+"""Synthetic-video benchmark for the kill detection pipeline.
+
+Generates recordings with the killfeed template composited into the ROI at
+known timestamps and reports scan speed, precision and recall.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --resolutions 1920x1080 2560x1440 --duration 120
+    python benchmark.py --set FRAME_SKIP=60 --set THRESHOLD=0.6 --json result.json
+    python benchmark.py --audio --set USE_AUDIO_PREPASS=true
+    python benchmark.py --crf 32 --set MATCHER=chamfer
+    python benchmark.py --check-batch --set DETECT_BATCH_SIZE=16
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+import cv2
+import numpy as np
+
+import main
+
+BENCH_FPS = 60
+ENTRY_LIFETIME = 5.0   # Seconds a killfeed entry stays on screen
+ROW_SPACING = 4        # Pixels between stacked killfeed rows
+NOISE_FRAMES = 8       # Pre-generated noise layers cycled over the video
+AUDIO_RATE = 22050     # Sample rate of the synthetic soundtrack
+
+def parse_resolution(value):
+    """Parse 'WIDTHxHEIGHT' into a (width, height) tuple"""
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+def parse_override(value):
+    """Parse 'KEY=VALUE' into a config override (VALUE as JSON if possible)"""
+    key, raw = value.split('=', 1)
+    try:
+        return key, json.loads(raw)
+    except json.JSONDecodeError:
+        return key, raw
+
+def make_gray_template(template):
+    """Gray-bordered variant of the template (enemy / teammate kill)"""
+    gray = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
+    return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+
+def scale_template(template, width, height, hud_scale):
+    """Resize template to match the HUD scale of the synthetic recording"""
+    if hud_scale != 'resolution' or height == 1080:
+        return template
+    factor = height / 1080
+    new_size = (max(1, round(template.shape[1] * factor)), max(1, round(template.shape[0] * factor)))
+    return cv2.resize(template, new_size, interpolation=cv2.INTER_AREA)
+
+def build_background(kind, width, height, rng):
+    """Static background for the synthetic recording"""
+    if kind == 'gameplay':
+        example = cv2.imread(main.get_resource_path('req/roi/example.jpg'))
+        if example is not None:
+            background = cv2.resize(example, (width, height), interpolation=cv2.INTER_AREA)
+            # The screenshot has a real killfeed, blur it out so only synthetic entries count
+            x1, y1 = int(width * 0.6), 0
+            y2 = int(height * 0.35)
+            background[y1:y2, x1:] = cv2.blur(background[y1:y2, x1:], (51, 51))
+            return background
+    # Random blocky texture, upscaled so it compresses like real footage
+    small = rng.integers(0, 256, size=(max(1, height // 16), max(1, width // 16), 3), dtype=np.uint8)
+    return cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR)
+
+def generate_events(duration, kills, gray_ratio, multikill_ratio, rng):
+    """Random kill events: list of dicts with time and border color"""
+    events = []
+    usable = max(1.0, duration - ENTRY_LIFETIME - 1.0)
+    slot = usable / max(1, kills)
+    for i in range(kills):
+        start = 1.0 + i * slot + rng.uniform(0, slot * 0.5)
+        border = 'gray' if rng.random() < gray_ratio else 'red'
+        events.append({'time': round(start, 3), 'border': border})
+        # Multi-kill: stacked rows shortly after the first one
+        if rng.random() < multikill_ratio:
+            for extra in range(int(rng.integers(1, 3))):
+                events.append({'time': round(start + 0.3 * (extra + 1), 3), 'border': border})
+    events.sort(key=lambda e: e['time'])
+    return events
+
+def killfeed_anchor(width, height, template_w):
+    """Top-right anchor of the killfeed inside the configured ROI"""
+    if main.USE_ROI:
+        x2 = int(width * main.ROI_X_END)
+        y1 = int(height * main.ROI_Y_START)
+    else:
+        x2, y1 = width, 0
+    x = max(0, x2 - template_w - 6)
+    y = y1 + 6
+    return x, y
+
+def generate_video(path, width, height, duration, events, background, templates, fps=BENCH_FPS):
+    """Write synthetic recording with killfeed entries at the event times"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"VideoWriter could not open {path}")
+
+    rng = np.random.default_rng(len(events))
+    noise = [rng.integers(-6, 7, size=background.shape, dtype=np.int16) for _ in range(NOISE_FRAMES)]
+    base = background.astype(np.int16)
+    template_h, template_w = templates['red'].shape[:2]
+    anchor_x, anchor_y = killfeed_anchor(width, height, template_w)
+
+    total_frames = int(duration * fps)
+    for frame_index in range(total_frames):
+        now = frame_index / fps
+        frame = np.clip(base + noise[frame_index % NOISE_FRAMES], 0, 255).astype(np.uint8)
+
+        # Active entries stack downwards in order of appearance
+        active = [e for e in events if e['time'] <= now < e['time'] + ENTRY_LIFETIME]
+        for row, event in enumerate(active):
+            y = anchor_y + row * (template_h + ROW_SPACING)
+            if y + template_h > height:
+                break
+            frame[y:y+template_h, anchor_x:anchor_x+template_w] = templates[event['border']]
+
+        writer.write(frame)
+    writer.release()
+
+def make_kill_sound(sample_rate=AUDIO_RATE):
+    """Short two-tone ping with a fast decay, stands in for the kill sound"""
+    t = np.arange(int(0.25 * sample_rate)) / sample_rate
+    envelope = np.exp(-t * 18.0)
+    sweep = np.sin(2 * np.pi * (1400 * t + 1600 * t * t))
+    return (0.6 * sweep + 0.4 * np.sin(2 * np.pi * 2600 * t)) * envelope
+
+def write_wav(path, samples, sample_rate=AUDIO_RATE):
+    """Write mono float samples (-1..1) as 16-bit PCM WAV"""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2')
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+
+def add_soundtrack(video_path, out_path, duration, events, kill_sound, rng, sample_rate=AUDIO_RATE):
+    """Mux a soundtrack (noise, gunshot-like bursts, kill sound at red events) into the video"""
+    samples = rng.normal(0.0, 0.03, int(duration * sample_rate))
+    # Gunshot-like noise bursts about once per second
+    burst_length = int(0.12 * sample_rate)
+    burst_envelope = np.exp(-np.arange(burst_length) / (0.02 * sample_rate))
+    for start in rng.uniform(0, duration - 0.2, int(duration)):
+        i = int(start * sample_rate)
+        samples[i:i+burst_length] += rng.normal(0.0, 0.4, burst_length) * burst_envelope
+    # The kill sound only plays for the player's own kills
+    for event in events:
+        if event['border'] != 'red':
+            continue
+        i = int(event['time'] * sample_rate)
+        part = kill_sound[:len(samples) - i]
+        samples[i:i+len(part)] += 0.5 * part
+
+    wav_path = os.path.splitext(out_path)[0] + '.wav'
+    write_wav(wav_path, samples, sample_rate)
+    cmd = ['ffmpeg', '-v', 'error', '-y', '-i', video_path, '-i', wav_path,
+           '-map', '0:v:0', '-map', '1:a:0', '-c:v', 'copy', '-c:a', 'aac', '-shortest', out_path]
+    subprocess.run(cmd, check=True)
+    os.remove(wav_path)
+
+def compress_video(video_path, out_path, crf):
+    """Re-encode with H.264 at the given CRF to mimic compressed recordings"""
+    cmd = ['ffmpeg', '-v', 'error', '-y', '-i', video_path, '-map', '0',
+           '-c:v', 'libx264', '-preset', 'veryfast', '-crf', str(crf), '-pix_fmt', 'yuv420p',
+           '-c:a', 'copy', out_path]
+    subprocess.run(cmd, check=True)
+
+def score_detections(detections, events, tolerance):
+    """Match detections to red events, return (tp, fp, fn)"""
+    positives = [e['time'] for e in events if e['border'] == 'red']
+    matched = [False] * len(positives)
+    tp = fp = 0
+    for detected in sorted(detections):
+        hit = None
+        for i, start in enumerate(positives):
+            if not matched[i] and start - tolerance <= detected <= start + ENTRY_LIFETIME + tolerance:
+                hit = i
+                break
+        if hit is None:
+            fp += 1
+        else:
+            matched[hit] = True
+            tp += 1
+    fn = matched.count(False)
+    return tp, fp, fn
+
+def ffmpeg_available():
+    """Check if FFmpeg is on PATH"""
+    return shutil.which('ffmpeg') is not None
+
+def run_case(video_path, events, duration, extract, workdir, check_batch=False):
+    """Run detection (and optionally extraction) on one synthetic video
+    check_batch: rescan with DETECT_BATCH_SIZE 1, batching must not change the detections"""
+    cap = cv2.VideoCapture(video_path)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    report = main.PerfReport(os.path.basename(video_path))
+    started = time.perf_counter()
+    kill_times, fps = main.detect_kills_in_video(video_path, main.TEMPLATE_PATH, report)
+    scan_time = time.perf_counter() - started
+
+    tolerance = main.FRAME_SKIP / BENCH_FPS + 0.1
+    tp, fp, fn = score_detections(kill_times, events, tolerance)
+    result = {
+        'scan_seconds': round(scan_time, 3),
+        'frames_per_sec': round(total_frames / scan_time, 1) if scan_time else 0.0,
+        'x_realtime': round(duration / scan_time, 2) if scan_time else 0.0,
+        'detections': len(kill_times),
+        'true_positives': tp,
+        'false_positives': fp,
+        'missed': fn,
+        'precision': round(tp / (tp + fp), 3) if tp + fp else 1.0,
+        'recall': round(tp / (tp + fn), 3) if tp + fn else 1.0,
+        'stages': {name: round(sec, 4) for name, sec in report.stages.items()},
+        'counters': dict(report.counters),
+    }
+
+    if check_batch and main.DETECT_BATCH_SIZE > 1:
+        batch_size = main.DETECT_BATCH_SIZE
+        main.DETECT_BATCH_SIZE = 1
+        try:
+            single_times, _ = main.detect_kills_in_video(video_path, main.TEMPLATE_PATH,
+                                                         main.PerfReport(os.path.basename(video_path)))
+        finally:
+            main.DETECT_BATCH_SIZE = batch_size
+        result['single_frame_detections'] = len(single_times)
+        result['batch_consistent'] = single_times == kill_times
+
+    if extract and kill_times:
+        main.OUTPUT_FOLDER = os.path.join(workdir, 'clips')
+        os.makedirs(main.OUTPUT_FOLDER, exist_ok=True)
+        clips = main.plan_clip_intervals(kill_times, duration, os.path.getsize(video_path), report, fps,
+                                           main.stream_copy_keyframes(video_path))
+        started = time.perf_counter()
+        main.extract_clips(video_path, clips, fps, os.path.basename(video_path), report)
+        extract_time = time.perf_counter() - started
+        clip_seconds = sum(end - start for start, end in clips)
+        result['extract_seconds'] = round(extract_time, 3)
+        result['clip_seconds_saved'] = report.settings['clip_seconds_saved']
+        result['clips_per_sec'] = round(len(clips) / extract_time, 2) if extract_time else 0.0
+        result['extract_x_realtime'] = round(clip_seconds / extract_time, 2) if extract_time else 0.0
+
+    return result
+
+def print_table(rows):
+    """Print results as a fixed-width table"""
+    header = f"{'case':<34} {'fps':>8} {'x-rt':>7} {'det':>5} {'prec':>6} {'recall':>7}"
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        if 'error' in row:
+            print(f"{row['case']:<34} ERROR: {row['error']}")
+            continue
+        line = (f"{row['case']:<34} {row['frames_per_sec']:>8.1f} {row['x_realtime']:>7.2f} "
+                f"{row['detections']:>5} {row['precision']:>6.3f} {row['recall']:>7.3f}")
+        if 'extract_x_realtime' in row:
+            line += f"  extract {row['extract_x_realtime']:.1f}x"
+        if row.get('batch_consistent') is False:
+            line += f"  BATCH MISMATCH ({row['single_frame_detections']} det at batch size 1)"
+        print(line)
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark kill detection on synthetic recordings")
+    parser.add_argument('--resolutions', nargs='+', type=parse_resolution,
+                        default=[(1920, 1080), (1280, 720)], help="e.g. 1920x1080 1280x720")
+    parser.add_argument('--backgrounds', nargs='+', choices=['random', 'gameplay'],
+                        default=['random', 'gameplay'])
+    parser.add_argument('--duration', type=float, default=60.0, help="Seconds per synthetic video")
+    parser.add_argument('--kills', type=int, default=12, help="Kill events per video")
+    parser.add_argument('--gray-ratio', type=float, default=0.25, help="Share of gray-bordered events")
+    parser.add_argument('--multikill-ratio', type=float, default=0.2, help="Share of stacked multi-kills")
+    parser.add_argument('--hud-scale', choices=['native', 'resolution'],
+                        help="Composite template at native size or scaled relative to 1080p "
+                             "(default: 'resolution' with AUTO_SCALE_TEMPLATE, else 'native')")
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--set', dest='overrides', action='append', type=parse_override, default=[],
+                        metavar='KEY=VALUE', help="Config override, may be repeated")
+    parser.add_argument('--extract', action='store_true', help="Also time extract_clips (needs FFmpeg)")
+    parser.add_argument('--check-batch', action='store_true',
+                        help="Rescan with DETECT_BATCH_SIZE=1 and fail if the detections differ")
+    parser.add_argument('--crf', type=int,
+                        help="Re-encode the synthetic videos with H.264 at this CRF (needs FFmpeg)")
+    parser.add_argument('--audio', action='store_true',
+                        help="Add a soundtrack with a synthetic kill sound (needs FFmpeg); "
+                             "combine with --set USE_AUDIO_PREPASS=true")
+    parser.add_argument('--workdir', help="Keep generated videos here (reused between runs)")
+    parser.add_argument('--json', dest='json_path', help="Write results to JSON file")
+    args = parser.parse_args(argv)
+
+    cfg = dict(main.load_config())
+    if args.extract and not ffmpeg_available():
+        print("FFmpeg not found, extraction will not be benchmarked")
+        args.extract = False
+    if args.crf is not None and not ffmpeg_available():
+        print("FFmpeg not found, videos are not re-encoded")
+        args.crf = None
+    if args.audio and not ffmpeg_available():
+        print("FFmpeg not found, videos are generated without audio")
+        args.audio = False
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='ezclips_bench_')
+    os.makedirs(workdir, exist_ok=True)
+
+    if args.audio:
+        kill_sound = make_kill_sound()
+        kill_sound_path = os.path.join(workdir, 'kill_sound.wav')
+        write_wav(kill_sound_path, kill_sound)
+        cfg['AUDIO_REFERENCE_PATH'] = os.path.abspath(kill_sound_path)
+
+    cfg.update(dict(args.overrides))
+    main.apply_config(cfg)
+    if args.hud_scale is None:
+        # Synthetic HUD that matches what the detector expects
+        args.hud_scale = 'resolution' if main.AUTO_SCALE_TEMPLATE else 'native'
+
+    template_red = cv2.imread(main.list_template_files(main.TEMPLATE_PATH)[0])
+    if template_red is None:
+        print(f"Template not found: {main.TEMPLATE_PATH}")
+        return 1
+
+    rows = []
+    for width, height in args.resolutions:
+        for kind in args.backgrounds:
+            case = f"{width}x{height} {kind}"
+            rng = np.random.default_rng(args.seed)
+            events = generate_events(args.duration, args.kills, args.gray_ratio, args.multikill_ratio, rng)
+            red = scale_template(template_red, width, height, args.hud_scale)
+            templates = {'red': red, 'gray': make_gray_template(red)}
+
+            video_path = os.path.join(workdir, f"synthetic_{width}x{height}_{kind}_{args.hud_scale}"
+                                               f"_{int(args.duration)}s_{args.kills}k_{args.seed}.mp4")
+            if not os.path.exists(video_path):
+                print(f"Generating {case}...")
+                background = build_background(kind, width, height, rng)
+                generate_video(video_path, width, height, args.duration, events, background, templates)
+
+            if args.crf is not None:
+                compressed_path = video_path[:-len('.mp4')] + f'_crf{args.crf}.mp4'
+                if not os.path.exists(compressed_path):
+                    compress_video(video_path, compressed_path, args.crf)
+                video_path = compressed_path
+
+            if args.audio:
+                audio_path = video_path[:-len('.mp4')] + '_audio.mp4'
+                if not os.path.exists(audio_path):
+                    add_soundtrack(video_path, audio_path, args.duration, events, kill_sound,
+                                   np.random.default_rng(args.seed))
+                video_path = audio_path
+
+            print(f"Scanning {case}...")
+            try:
+                row = run_case(video_path, events, args.duration, args.extract, workdir, args.check_batch)
+            except Exception as e:
+                row = {'error': (str(e).strip().splitlines() or [type(e).__name__])[-1]}
+            row.update({'case': case, 'width': width, 'height': height, 'background': kind,
+                        'events': len(events),
+                        'red_events': sum(1 for e in events if e['border'] == 'red')})
+            rows.append(row)
+
+    print()
+    print_table(rows)
+
+    if args.json_path:
+        settings = {key: cfg.get(key) for key in ('FRAME_SKIP', 'THRESHOLD', 'MIN_COLOR_PIXELS',
+                                                  'USE_EDGE_DETECTION', 'USE_COLOR_FILTER', 'USE_ROI')}
+        settings.update(dict(args.overrides))
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({'settings': settings, 'results': rows}, f, indent=2)
+        print(f"\nResults written to {args.json_path}")
+
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if any(row.get('batch_consistent') is False for row in rows):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
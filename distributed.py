@@ -0,0 +1,363 @@
+"""Multi-machine processing over a shared input folder.
+
+Every worker scans the same INPUT_FOLDER and claims videos through lease
+files in a shared state directory. Leases are created atomically
+(O_CREAT | O_EXCL), renewed by a heartbeat while the video is processed and
+taken over by another worker once they expire, so a crashed machine never
+blocks a video for good. A worker whose lease was taken over abandons the
+video: clips are encoded under temp names and only renamed into place while
+the lease is still held. Each worker appends its results to its own file,
+finished videos get a done marker; nothing is read-modify-written by two
+workers.
+
+State directory layout (default: {INPUT_FOLDER}/.ezclips), {key} is the
+cleaned-up file name plus a short hash of the name:
+    leases/{key}.lease        claim of the video being processed (JSON)
+    done/{key}.json           finished (or failed) video, written atomically
+    results/{worker}.jsonl    one line per video processed by that worker
+
+Any shared POSIX filesystem works (NFS, SMB mounts, a local directory for
+testing with several processes). Worker clocks should be roughly in sync,
+the lease timeout is the margin.
+
+Usage:
+    python distributed.py --worker rig-1
+    python distributed.py --state-dir /mnt/share/.ezclips --wait
+    python distributed.py --status
+"""
+import argparse
+import hashlib
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+
+import main
+
+DEFAULT_LEASE_TIMEOUT = 120.0  # Seconds without heartbeat before a lease can be taken over
+DEFAULT_HEARTBEAT = 20.0  # Seconds between lease renewals
+DEFAULT_POLL = 30.0  # Seconds between scans while --wait is waiting for other workers
+
+class ConsoleOutput:
+    """Stand-in for the GUI: prints log lines with the worker name"""
+    shows_preview = False
+
+    def __init__(self, worker):
+        self.worker = worker
+
+    def add_log(self, message, level='info'):
+        for line in str(message).strip('\n').splitlines():
+            print(f"[{self.worker}] {line}", flush=True)
+
+    def update_progress(self, current, total, text=""):
+        pass
+
+    def update_preview(self, frame):
+        pass
+
+def safe_name(name):
+    """Name with everything but letters, digits and -_. replaced by _"""
+    return ''.join(c if c.isalnum() or c in '-_.' else '_' for c in name)
+
+def video_key(video_path):
+    """File-name-safe key of a video in the shared folder.
+    A hash of the file name keeps names that clean up alike ("a b.mp4", "a_b.mp4") apart;
+    the path is left out, workers may mount the share in different places."""
+    name = os.path.basename(video_path)
+    return f"{safe_name(name)}_{hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]}"
+
+def write_json_atomic(path, data):
+    """Write JSON through a temp file and rename, readers never see a partial file"""
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+def read_json(path):
+    """JSON content of a file, None if missing or unreadable"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+class LeaseStore:
+    """Lease files, done markers and per-worker results in a shared directory"""
+
+    def __init__(self, state_dir, worker, lease_timeout=DEFAULT_LEASE_TIMEOUT):
+        self.state_dir = state_dir
+        self.worker = worker
+        self.lease_timeout = lease_timeout
+        self.lease_dir = os.path.join(state_dir, 'leases')
+        self.done_dir = os.path.join(state_dir, 'done')
+        self.results_dir = os.path.join(state_dir, 'results')
+        for folder in (self.lease_dir, self.done_dir, self.results_dir):
+            os.makedirs(folder, exist_ok=True)
+
+    def lease_path(self, key):
+        return os.path.join(self.lease_dir, key + '.lease')
+
+    def done_path(self, key):
+        return os.path.join(self.done_dir, key + '.json')
+
+    def is_done(self, key):
+        return os.path.exists(self.done_path(key))
+
+    def lease_age(self, key):
+        """Seconds since the lease was created or renewed, None without a lease"""
+        try:
+            return time.time() - os.stat(self.lease_path(key)).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def try_claim(self, key):
+        """Create the lease atomically, taking over an expired one; returns the lease token or None"""
+        path = self.lease_path(key)
+        age = self.lease_age(key)
+        if age is not None:
+            if age < self.lease_timeout:
+                return None
+            expired = read_json(path) or {}
+            # Expired: rename is atomic, only one worker wins the takeover
+            stale_path = f"{path}.{uuid.uuid4().hex}.stale"
+            try:
+                os.rename(path, stale_path)
+            except FileNotFoundError:
+                return None
+            # Another worker may have taken over and created a fresh lease since our checks: we moved that one
+            stale = read_json(stale_path) or {}
+            try:
+                moved_age = time.time() - os.stat(stale_path).st_mtime
+            except FileNotFoundError:
+                return None
+            if moved_age < self.lease_timeout or stale.get('token') != expired.get('token'):
+                self._restore_lease(stale_path, path)
+                return None
+            os.remove(stale_path)
+            main.log_message(f"Lease of {key} taken over from {stale.get('worker', '?')} "
+                             f"(no heartbeat for {age:.0f}s)", "warning")
+
+        token = uuid.uuid4().hex
+        lease = {'worker': self.worker, 'token': token, 'host': socket.gethostname(),
+                 'pid': os.getpid(), 'claimed': time.time()}
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return None
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(lease, f)
+
+        # Another worker may have finished the video between our checks
+        if self.is_done(key):
+            self.release(key, token)
+            return None
+        return token
+
+    def _restore_lease(self, stale_path, path):
+        """Put a lease moved by mistake back, unless a newer one is already there"""
+        try:
+            # link keeps the inode and mtime and fails if the path exists
+            os.link(stale_path, path)
+        except FileExistsError:
+            # Its owner sees the lease as lost at the next heartbeat
+            pass
+        except OSError:
+            # No hard links on this filesystem (some SMB mounts)
+            if not os.path.exists(path):
+                os.rename(stale_path, path)
+                return
+        os.remove(stale_path)
+
+    def holds(self, key, token):
+        lease = read_json(self.lease_path(key))
+        return lease is not None and lease.get('token') == token
+
+    def renew(self, key, token):
+        """Heartbeat: refresh the lease mtime; False once the lease belongs to someone else"""
+        if not self.holds(key, token):
+            return False
+        try:
+            os.utime(self.lease_path(key))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def release(self, key, token):
+        if self.holds(key, token):
+            try:
+                os.remove(self.lease_path(key))
+            except FileNotFoundError:
+                pass
+
+    def record(self, key, result, mark_done=True):
+        """Append the result to this worker's file and mark the video done"""
+        result = dict(result, worker=self.worker, video_key=key)
+        # One writer per results file, so appends never interleave or get lost
+        with open(os.path.join(self.results_dir, f"{safe_name(self.worker)}.jsonl"), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(result, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        if mark_done:
+            write_json_atomic(self.done_path(key), result)
+
+    def status(self):
+        """(done markers, active leases, expired leases) as lists of dicts"""
+        done = [read_json(os.path.join(self.done_dir, name)) or {'video_key': name[:-5]}
+                for name in sorted(os.listdir(self.done_dir)) if name.endswith('.json')]
+        active, expired = [], []
+        for name in sorted(os.listdir(self.lease_dir)):
+            if not name.endswith('.lease'):
+                continue
+            key = name[:-len('.lease')]
+            age = self.lease_age(key)
+            if age is None:
+                continue
+            lease = dict(read_json(self.lease_path(key)) or {}, video_key=key, age=round(age, 1))
+            (active if age < self.lease_timeout else expired).append(lease)
+        return done, active, expired
+
+class Heartbeat:
+    """Renews a lease on a background thread while a video is processed"""
+
+    def __init__(self, store, key, token, interval):
+        self.store = store
+        self.key = key
+        self.token = token
+        self.interval = interval
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='heartbeat', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self.store.renew(self.key, self.token):
+                self.lost = True
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+def run_worker(store, input_folder, heartbeat, wait, poll):
+    """Claim and process videos until none are left; returns the number processed here"""
+    processed = 0
+    while True:
+        videos = sorted(os.path.join(input_folder, name) for name in os.listdir(input_folder)
+                        if name.lower().endswith(tuple(main.VIDEO_EXTENSIONS)))
+        pending = main.order_videos([path for path in videos if not store.is_done(video_key(path))])
+        claimed = False
+        for video_path in pending:
+            key = video_key(video_path)
+            token = store.try_claim(key)
+            if token is None:
+                continue
+            claimed = True
+            processed += 1
+            main.log_message(f"Claimed {os.path.basename(video_path)}", "info")
+            started = time.time()
+            result = {'video': os.path.basename(video_path), 'started': started}
+            beat = Heartbeat(store, key, token, heartbeat)
+
+            def lease_lost():
+                # The heartbeat only notices a takeover at its next renewal, the lease file tells at once
+                return beat.lost or not store.holds(key, token)
+
+            try:
+                with beat:
+                    # Abandoned as soon as the lease is lost: the new owner writes the same clips
+                    clips = main.process_video(video_path, main.TEMPLATE_PATH, record_processed=False,
+                                               cancelled=lease_lost)
+                result.update(status='done', clips=clips)
+            except Exception as e:
+                # Marked done anyway: a video that crashes the pipeline would crash every worker.
+                # Delete its done marker to retry it
+                main.log_message(f"{main.t('log_error')}: {os.path.basename(video_path)}: {e}", "error")
+                result.update(status='failed', error=str(e))
+            result.update(finished=time.time(), seconds=round(time.time() - started, 3))
+
+            if lease_lost():
+                # Someone took the lease over meanwhile; they process and record the video
+                main.log_message(f"Lease of {key} was lost, video abandoned (noted in the worker log only)", "warning")
+                store.record(key, dict(result, status='lease_lost'), mark_done=False)
+            else:
+                store.record(key, result)
+                store.release(key, token)
+            # Re-list the folder: new videos and finished claims of other workers
+            break
+
+        if claimed:
+            continue
+        if not pending or not wait:
+            return processed
+        # Videos are leased by other workers: wait for them to finish or their leases to expire
+        time.sleep(poll)
+
+def print_status(store):
+    done, active, expired = store.status()
+    print(f"Done: {len(done)}  Active leases: {len(active)}  Expired leases: {len(expired)}")
+    for entry in done:
+        print(f"  done     {entry.get('video_key')}  {entry.get('status', '?'):<8} "
+              f"clips={entry.get('clips', '-')}  by {entry.get('worker', '?')}")
+    for lease in active:
+        print(f"  active   {lease['video_key']}  by {lease.get('worker', '?')}  heartbeat {lease['age']}s ago")
+    for lease in expired:
+        print(f"  expired  {lease['video_key']}  by {lease.get('worker', '?')}  heartbeat {lease['age']}s ago")
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Process a shared input folder from several machines")
+    parser.add_argument('--input', help="Shared input folder (default: INPUT_FOLDER from config.json)")
+    parser.add_argument('--output', help="Output folder (default: OUTPUT_FOLDER from config.json)")
+    parser.add_argument('--state-dir', help="Shared lease/result directory (default: {input}/.ezclips)")
+    parser.add_argument('--worker', default=f"{socket.gethostname()}-{os.getpid()}", help="Worker name")
+    parser.add_argument('--lease-timeout', type=float, default=DEFAULT_LEASE_TIMEOUT)
+    parser.add_argument('--heartbeat', type=float, default=DEFAULT_HEARTBEAT)
+    parser.add_argument('--wait', action='store_true', help="Keep polling until every video is done")
+    parser.add_argument('--poll', type=float, default=DEFAULT_POLL)
+    parser.add_argument('--status', action='store_true', help="Show done videos and leases, then exit")
+    args = parser.parse_args(argv)
+
+    if args.heartbeat >= args.lease_timeout:
+        parser.error("--heartbeat must be shorter than --lease-timeout")
+
+    cfg = dict(main.load_config())
+    if args.input:
+        cfg['INPUT_FOLDER'] = args.input
+    if args.output:
+        cfg['OUTPUT_FOLDER'] = args.output
+    main.apply_config(cfg)
+
+    input_folder = main.INPUT_FOLDER
+    if not os.path.isdir(input_folder):
+        print(f"Input folder not found: {input_folder}")
+        return 1
+    store = LeaseStore(args.state_dir or os.path.join(input_folder, '.ezclips'), args.worker, args.lease_timeout)
+
+    if args.status:
+        print_status(store)
+        return 0
+
+    main.gui_instance = ConsoleOutput(args.worker)
+    languages = main.load_languages()
+    main.language_texts = languages.get(cfg.get('LANGUAGE', 'tr'), languages['tr'])
+    main.use_gpu = main.check_gpu_available()
+    main.create_output_folder()
+
+    telemetry_writer = main.start_telemetry()
+    try:
+        processed = run_worker(store, input_folder, args.heartbeat, args.wait, args.poll)
+    finally:
+        if telemetry_writer is not None:
+            telemetry_writer.stop()
+    main.log_message(f"{main.t('log_processed_videos')}: {processed}", "success")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
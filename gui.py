@@ -1,3 +1,5 @@
+import time
+STARTUP_STARTED = time.perf_counter()  # Before the other imports, so startup timing includes them
 import customtkinter as ctk
 from tkinter import messagebox, Canvas, PhotoImage, Menu, filedialog
 import json
@@ -5,14 +7,22 @@ import threading
 import os
 from pathlib import Path
 import subprocess
-from PIL import Image, ImageTk, ImageDraw
-import cv2
+import colorsys
 import queue
 import urllib.request
 import urllib.error
 import sys
 import shutil
 
+# Option lists for 'choice' settings
+SETTING_CHOICES = {
+    'LANGUAGE': ["tr", "en"],
+    'MATCHER': ["ccoeff", "chamfer"],
+    'CLIP_OUTPUT_MODE': ["copy", "reencode", "virtual"],
+    'BATCH_ORDER': ["name", "shortest", "smallest", "newest"],
+    'TELEMETRY_FORMAT': ["off", "prometheus", "jsonl"],
+}
+
 def get_resource_path(relative_path):
     """Get absolute path to resource, works for dev and for PyInstaller"""
     try:
@@ -64,6 +74,10 @@ VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv']
 # App version
 APP_VERSION = "1.0.0"
 
+# Seconds from launch until the window should be interactive; slower starts are logged as a warning
+STARTUP_BUDGET = 1.0
+THUMBNAIL_SIZE = (120, 68)
+
 def check_for_updates():
     """Check for updates on GitHub"""
     try:
@@ -95,9 +109,12 @@ def load_languages():
         return {"tr": {}, "en": {}}
 
 LANGUAGES = load_languages()
+STARTUP_IMPORTED = time.perf_counter()
 
 class VideoProcessorGUI:
     def __init__(self, root):
+        self.startup_times = {'imports': STARTUP_IMPORTED - STARTUP_STARTED}
+        self.mark_startup('window')
         self.root = root
         self.root.geometry("1400x900")
         # Uygulama iconu
@@ -111,6 +128,7 @@ class VideoProcessorGUI:
         
         # Config dosyasını yükle
         self.load_config()
+        self.mark_startup('config')
         
         # Version'ı config'ten al (tek kaynak - sadece config.json güncelle)
         global APP_VERSION
@@ -127,12 +145,23 @@ class VideoProcessorGUI:
         self.preview_queue = queue.Queue()
         self.progress_queue = queue.Queue()
         
+        # Thumbnail'ler arka planda çıkarılır, hazır olanlar check_queues'da gösterilir
+        self.thumbnail_jobs = queue.Queue()
+        self.thumbnail_queue = queue.Queue()
+        self.thumbnail_cache = {}
+        self.thumbnail_pending = {}
+        self.thumbnail_thread = None
+        
         # İşlem durumu
         self.is_processing = False
         self.process_thread = None
         
+        # Background update check result, shown in the settings tab
+        self.update_info = None
+        
         # Ana layout
         self.create_ui()
+        self.mark_startup('ui')
         
         # Check for updates on startup
         self.check_updates_on_startup()
@@ -140,6 +169,22 @@ class VideoProcessorGUI:
         # Queue'ları kontrol et (her 100ms)
         self.check_queues()
         
+        # The window is interactive once the event loop first goes idle
+        self.root.after_idle(self.finish_startup)
+    
+    def mark_startup(self, name):
+        """Record seconds since launch for the startup timing log"""
+        self.startup_times[name] = time.perf_counter() - STARTUP_STARTED
+    
+    def finish_startup(self):
+        """Log startup timing once the window is interactive"""
+        self.mark_startup('interactive')
+        total = self.startup_times['interactive']
+        steps = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.startup_times.items() if name != 'interactive')
+        self.add_log(f"{self.t('log_startup_time')}: {total:.2f}s ({steps})", "info")
+        if total > STARTUP_BUDGET:
+            self.add_log(self.t('log_startup_over_budget').format(budget=STARTUP_BUDGET), "warning")
+        
     def load_config(self):
         """Load settings from config file"""
         try:
@@ -181,6 +226,7 @@ class VideoProcessorGUI:
         def check():
             try:
                 update_info = check_for_updates()
+                self.root.after(0, lambda: self.show_update_status(update_info))
                 if update_info.get('has_update'):
                     def show_update():
                         response = messagebox.askyesno(
@@ -198,6 +244,20 @@ class VideoProcessorGUI:
         thread = threading.Thread(target=check, daemon=True)
         thread.start()
     
+    def show_update_status(self, update_info):
+        """Keep the update check result and show it in the settings tab (if built)"""
+        self.update_info = update_info
+        if not hasattr(self, 'version_label'):
+            return
+        if update_info and update_info.get('has_update'):
+            self.version_label.configure(text=f"🔄 New update available: v{update_info['version']}",
+                                         font=ctk.CTkFont(size=12, weight="bold"),
+                                         text_color="#FFA726")
+        else:
+            self.version_label.configure(text=f"✓ v{self.config.get('APP_VERSION', '1.0.0')}",
+                                         font=ctk.CTkFont(size=12),
+                                         text_color="gray60")
+    
     def t(self, key):
         """Get translation"""
         return self.texts.get(key, key)
@@ -205,7 +265,7 @@ class VideoProcessorGUI:
     def create_ui(self):
         """Create main UI"""
         # Ana tabview
-        self.tabview = ctk.CTkTabview(self.root, corner_radius=15)
+        self.tabview = ctk.CTkTabview(self.root, corner_radius=15, command=self.on_tab_change)
         self.tabview.pack(fill="both", expand=True, padx=20, pady=20)
         
         # Tabları ekle
@@ -214,11 +274,31 @@ class VideoProcessorGUI:
         self.tabview.add(self.t('tab_clips'))
         self.tabview.add(self.t('tab_settings'))
         
-        # Tab içeriklerini oluştur
-        self.create_process_tab()
-        self.create_videos_tab()
-        self.create_clips_tab()
-        self.create_settings_tab()
+        # Tab içerikleri ilk gösterildiklerinde oluşturulur
+        self.tab_builders = {
+            self.t('tab_process'): self.create_process_tab,
+            self.t('tab_videos'): self.create_videos_tab,
+            self.t('tab_clips'): self.create_clips_tab,
+            self.t('tab_settings'): self.create_settings_tab,
+        }
+        self.built_tabs = set()
+        # The process tab holds the log, it is always built
+        self.build_tab(self.t('tab_process'))
+        self.build_tab(self.tabview.get())
+    
+    def on_tab_change(self):
+        """Tab selected"""
+        self.build_tab(self.tabview.get())
+    
+    def build_tab(self, name):
+        """Build a tab's contents the first time it is shown"""
+        if name in self.built_tabs:
+            return
+        self.built_tabs.add(name)
+        started = time.perf_counter()
+        self.tab_builders[name]()
+        if name != self.t('tab_process'):
+            self.add_log(f"{self.t('log_tab_built')}: {name} ({time.perf_counter() - started:.2f}s)", "info")
     
     def create_process_tab(self):
         """Process tab"""
@@ -355,20 +435,10 @@ class VideoProcessorGUI:
         ctk.CTkLabel(top_frame, text=self.t('tab_settings'),
                     font=ctk.CTkFont(size=20, weight="bold")).pack(side="left", padx=20)
         
-        # Version bilgisi
-        version_info = f"v{self.config.get('APP_VERSION', '1.0.0')}"
-        update_check = check_for_updates()
-        if update_check.get('has_update'):
-            version_label = ctk.CTkLabel(top_frame, 
-                                        text=f"🔄 New update available: v{update_check['version']}",
-                                        font=ctk.CTkFont(size=12, weight="bold"),
-                                        text_color="#FFA726")
-        else:
-            version_label = ctk.CTkLabel(top_frame,
-                                        text=f"✓ {version_info}",
-                                        font=ctk.CTkFont(size=12),
-                                        text_color="gray60")
-        version_label.pack(side="right", padx=20)
+        # Version bilgisi (güncelleme kontrolü arka planda yapılır, sonucu show_update_status gösterir)
+        self.version_label = ctk.CTkLabel(top_frame, text="")
+        self.version_label.pack(side="right", padx=20)
+        self.show_update_status(self.update_info)
         
         ctk.CTkButton(top_frame, text=self.t('save_settings'),
                      command=self.save_settings,
@@ -385,16 +455,47 @@ class VideoProcessorGUI:
         settings_groups = [
             (self.t('settings_general'), [
                 ('LANGUAGE', self.t('language'), 'choice'),
+                ('BATCH_ORDER', self.t('batch_order'), 'choice'),
+                ('TELEMETRY_FORMAT', self.t('telemetry_format'), 'choice'),
+                ('TELEMETRY_PATH', self.t('telemetry_path'), 'str'),
+                ('TELEMETRY_INTERVAL', self.t('telemetry_interval'), 'float'),
             ]),
             (self.t('settings_detection'), [
                 ('THRESHOLD', self.t('threshold'), 'float'),
                 ('FRAME_SKIP', self.t('frame_skip'), 'int'),
                 ('KILL_COOLDOWN', self.t('kill_cooldown'), 'float'),
+                ('DECODE_SCALE', self.t('decode_scale'), 'float'),
+                ('USE_CHANGE_GATE', self.t('use_change_gate'), 'bool'),
+                ('CHANGE_GATE_THRESHOLD', self.t('change_gate_threshold'), 'float'),
+                ('USE_KILL_TRACKER', self.t('use_kill_tracker'), 'bool'),
+                ('KILLFEED_ENTRY_LIFETIME', self.t('killfeed_entry_lifetime'), 'float'),
+                ('AUTO_SCALE_TEMPLATE', self.t('auto_scale_template'), 'bool'),
+                ('TEMPLATE_REFERENCE_HEIGHT', self.t('template_reference_height'), 'int'),
+                ('TEMPLATE_CALIBRATION', self.t('template_calibration'), 'bool'),
+                ('USE_AUDIO_PREPASS', self.t('use_audio_prepass'), 'bool'),
+                ('AUDIO_MATCH_THRESHOLD', self.t('audio_match_threshold'), 'float'),
+                ('AUDIO_WINDOW_BEFORE', self.t('audio_window_before'), 'float'),
+                ('AUDIO_WINDOW_AFTER', self.t('audio_window_after'), 'float'),
+                ('USE_COLOR_GATE', self.t('use_color_gate'), 'bool'),
+                ('COLOR_GATE_SCALE', self.t('color_gate_scale'), 'float'),
+                ('USE_ROI_CACHE', self.t('use_roi_cache'), 'bool'),
+                ('USE_PTS_INDEX', self.t('use_pts_index'), 'bool'),
             ]),
             (self.t('settings_buffer'), [
                 ('BUFFER_BEFORE', self.t('buffer_before'), 'float'),
                 ('BUFFER_AFTER', self.t('buffer_after'), 'float'),
                 ('MIN_KILL_GAP', self.t('min_kill_gap'), 'float'),
+                ('MAX_CLIP_LENGTH', self.t('max_clip_length'), 'float'),
+                ('MIN_CLIP_LENGTH', self.t('min_clip_length'), 'float'),
+                ('CLIP_OUTPUT_MODE', self.t('clip_output_mode'), 'choice'),
+                ('REENCODE_CODEC', self.t('reencode_codec'), 'str'),
+                ('REENCODE_PRESET', self.t('reencode_preset'), 'str'),
+                ('REENCODE_CRF', self.t('reencode_crf'), 'int'),
+                ('REENCODE_MAX_BITRATE', self.t('reencode_max_bitrate'), 'int'),
+                ('REENCODE_MAX_SIZE_MB', self.t('reencode_max_size_mb'), 'float'),
+                ('ENCODE_JOBS', self.t('encode_jobs'), 'int'),
+                ('ENCODE_THREADS', self.t('encode_threads'), 'int'),
+                ('ENCODE_LOW_PRIORITY', self.t('encode_low_priority'), 'bool'),
             ]),
             (self.t('settings_roi'), [
                 ('USE_ROI', self.t('use_roi'), 'bool'),
@@ -412,7 +513,13 @@ class VideoProcessorGUI:
                 ('KILL_COLOR_UPPER2', 'Red Color Range 2 (HSV Upper)', 'color_hsv'),
                 ('CANNY_THRESHOLD1', self.t('canny_threshold1'), 'int'),
                 ('CANNY_THRESHOLD2', self.t('canny_threshold2'), 'int'),
+                ('MATCHER', self.t('matcher'), 'choice'),
+                ('CHAMFER_THRESHOLD', self.t('chamfer_threshold'), 'float'),
+                ('CHAMFER_POINTS', self.t('chamfer_points'), 'int'),
+                ('DETECT_BATCH_SIZE', self.t('detect_batch_size'), 'int'),
+                ('DETECT_WORKERS', self.t('detect_workers'), 'int'),
                 ('MIN_COLOR_PIXELS', self.t('min_color_pixels'), 'int'),
+                ('COLOR_FILTER_BORDER', self.t('color_filter_border'), 'int'),
             ]),
         ]
         
@@ -508,23 +615,22 @@ class VideoProcessorGUI:
                                           width=60, height=28)
                     switch.pack(side="left")
                 elif type_ == 'choice':
-                    var = ctk.StringVar(value=str(self.config.get(key, 'tr')))
+                    values = SETTING_CHOICES[key]
+                    var = ctk.StringVar(value=str(self.config.get(key, values[0])))
                     combo = ctk.CTkOptionMenu(setting_row, variable=var,
-                                              values=["tr", "en"],
+                                              values=values,
                                               width=150, height=35, corner_radius=8,
-                                              command=self.change_language)
+                                              command=self.change_language if key == 'LANGUAGE' else None)
                     combo.pack(side="left")
                 elif type_ == 'color_hsv':
                     # HSV renk değerlerini göster
                     hsv_values = self.config.get(key, [0, 0, 0])
                     var = ctk.StringVar(value=str(hsv_values))
                     
-                    # Renk örneği (HSV -> RGB dönüştürüp göster)
+                    # Renk örneği (HSV -> RGB dönüştürüp göster, OpenCV HSV: H 0-180, S/V 0-255)
                     try:
-                        import numpy as np
-                        hsv_color = np.uint8([[[hsv_values[0], hsv_values[1], hsv_values[2]]]])
-                        rgb_color = cv2.cvtColor(hsv_color, cv2.COLOR_HSV2RGB)[0][0]
-                        color_hex = f"#{rgb_color[0]:02x}{rgb_color[1]:02x}{rgb_color[2]:02x}"
+                        rgb_color = colorsys.hsv_to_rgb(hsv_values[0] / 180, hsv_values[1] / 255, hsv_values[2] / 255)
+                        color_hex = "#" + "".join(f"{round(channel * 255):02x}" for channel in rgb_color)
                         
                         color_preview = ctk.CTkLabel(setting_row, text="  ", width=40, height=30,
                                                    fg_color=color_hex, corner_radius=5)
@@ -551,6 +657,8 @@ class VideoProcessorGUI:
             return
         
         try:
+            from PIL import Image, ImageDraw
+            
             # example.jpg'yi yükle
             img_path = Path(get_resource_path('req/roi/example.jpg'))
             if not img_path.exists():
@@ -671,9 +779,12 @@ class VideoProcessorGUI:
         except Exception as e:
             messagebox.showerror("Error / Hata", f"Settings could not be saved / Ayarlar kaydedilemedi: {e}")
     
-    def get_video_thumbnail(self, video_path, size=(120, 68)):
-        """Extract thumbnail from video"""
+    def get_video_thumbnail(self, video_path, size=THUMBNAIL_SIZE):
+        """Extract thumbnail from video as a PIL image (runs on the thumbnail thread)"""
         try:
+            import cv2
+            from PIL import Image
+            
             cap = cv2.VideoCapture(str(video_path))
             # Get middle frame
             total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
@@ -687,13 +798,47 @@ class VideoProcessorGUI:
                 # Resize to thumbnail size
                 img = Image.fromarray(frame_rgb)
                 img.thumbnail(size, Image.Resampling.LANCZOS)
-                return ctk.CTkImage(light_image=img, dark_image=img, size=size)
+                return img
         except:
             pass
         return None
     
+    def request_thumbnail(self, label, video_path):
+        """Show the thumbnail in `label` now if cached, otherwise once the thumbnail thread has decoded it"""
+        try:
+            key = (str(video_path), video_path.stat().st_mtime)
+        except OSError:
+            return
+        if key in self.thumbnail_cache:
+            self.show_thumbnail(label, self.thumbnail_cache[key])
+            return
+        # A refresh can request the same file again before its thumbnail arrives
+        if key in self.thumbnail_pending:
+            self.thumbnail_pending[key].append(label)
+            return
+        self.thumbnail_pending[key] = [label]
+        self.thumbnail_jobs.put((video_path, key))
+        if self.thumbnail_thread is None:
+            self.thumbnail_thread = threading.Thread(target=self.thumbnail_worker, daemon=True)
+            self.thumbnail_thread.start()
+    
+    def thumbnail_worker(self):
+        """Decode thumbnails one by one; the GUI thread picks them up in check_queues"""
+        while True:
+            video_path, key = self.thumbnail_jobs.get()
+            self.thumbnail_queue.put((key, self.get_video_thumbnail(video_path)))
+    
+    def show_thumbnail(self, label, thumbnail):
+        if thumbnail is None or not label.winfo_exists():
+            return
+        label.configure(image=thumbnail, fg_color="transparent")
+    
     def refresh_videos(self):
         """Refresh video list"""
+        # Not built yet: the tab lists the folder when it is first shown
+        if self.t('tab_videos') not in self.built_tabs:
+            return
+        
         # Eski kartları temizle
         for widget in self.videos_scroll.winfo_children():
             widget.destroy()
@@ -745,12 +890,12 @@ class VideoProcessorGUI:
             # Sağ tık menüsünü content'e de ekle
             content.bind("<Button-3>", lambda e, vn=video_name, ip=is_processed: self.show_video_context_menu(e, vn, ip))
             
-            # Thumbnail (sol)
-            thumbnail = self.get_video_thumbnail(video_file)
-            if thumbnail:
-                thumb_label = ctk.CTkLabel(content, image=thumbnail, text="")
-                thumb_label.pack(side="left", padx=(0, 15))
-                thumb_label.bind("<Button-3>", lambda e, vn=video_name, ip=is_processed: self.show_video_context_menu(e, vn, ip))
+            # Thumbnail (sol) - arka planda yüklenir
+            thumb_label = ctk.CTkLabel(content, text="", width=THUMBNAIL_SIZE[0], height=THUMBNAIL_SIZE[1],
+                                       fg_color=("gray80", "gray30"), corner_radius=6)
+            thumb_label.pack(side="left", padx=(0, 15))
+            thumb_label.bind("<Button-3>", lambda e, vn=video_name, ip=is_processed: self.show_video_context_menu(e, vn, ip))
+            self.request_thumbnail(thumb_label, video_file)
             
             # Bilgi (orta)
             info_frame = ctk.CTkFrame(content, fg_color="transparent")
@@ -781,6 +926,10 @@ class VideoProcessorGUI:
     
     def refresh_clips(self):
         """Refresh clip list"""
+        # Not built yet: the tab lists the folder when it is first shown
+        if self.t('tab_clips') not in self.built_tabs:
+            return
+        
         # Eski kartları temizle
         for widget in self.clips_scroll.winfo_children():
             widget.destroy()
@@ -815,11 +964,11 @@ class VideoProcessorGUI:
             content = ctk.CTkFrame(card, fg_color="transparent")
             content.pack(fill="x", padx=20, pady=15)
             
-            # Thumbnail (sol)
-            thumbnail = self.get_video_thumbnail(clip_file)
-            if thumbnail:
-                thumb_label = ctk.CTkLabel(content, image=thumbnail, text="")
-                thumb_label.pack(side="left", padx=(0, 15))
+            # Thumbnail (sol) - arka planda yüklenir
+            thumb_label = ctk.CTkLabel(content, text="", width=THUMBNAIL_SIZE[0], height=THUMBNAIL_SIZE[1],
+                                       fg_color=("gray80", "gray30"), corner_radius=6)
+            thumb_label.pack(side="left", padx=(0, 15))
+            self.request_thumbnail(thumb_label, clip_file)
             
             # Bilgi (orta)
             info_frame = ctk.CTkFrame(content, fg_color="transparent")
@@ -861,9 +1010,8 @@ class VideoProcessorGUI:
             try:
                 filepath.unlink()
                 messagebox.showinfo("Success / Başarılı", "Clip deleted successfully!\nKlip başarıyla silindi!")
-                # Run refresh in background thread to avoid UI freeze
-                refresh_thread = threading.Thread(target=self.refresh_clips, daemon=True)
-                refresh_thread.start()
+                # Thumbnails load in the background, the refresh itself is cheap
+                self.root.after(0, self.refresh_clips)
             except Exception as e:
                 messagebox.showerror("Error / Hata", f"Could not delete clip / Klip silinemedi: {e}")
     
@@ -1052,9 +1200,24 @@ class VideoProcessorGUI:
         except queue.Empty:
             pass
         
+        # Thumbnail queue
+        try:
+            while True:
+                key, img = self.thumbnail_queue.get_nowait()
+                thumbnail = ctk.CTkImage(light_image=img, dark_image=img, size=THUMBNAIL_SIZE) if img else None
+                self.thumbnail_cache[key] = thumbnail
+                for label in self.thumbnail_pending.pop(key, []):
+                    self.show_thumbnail(label, thumbnail)
+        except queue.Empty:
+            pass
+        
         # Preview queue
         try:
             frame = self.preview_queue.get_nowait()
+            # cv2/PIL are only needed once processing shows previews
+            import cv2
+            from PIL import Image, ImageTk
+            
             # OpenCV BGR -> RGB
             frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
             # Resize
@@ -3,8 +3,21 @@ import numpy as np
 import subprocess
 import os
 import json
+import shutil
 from pathlib import Path
 import sys
+import time
+import hashlib
+import itertools
+import fnmatch
+import math
+import queue
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import telemetry
+import timeline
 
 def get_resource_path(relative_path):
     """Get absolute path to resource, works for dev and for PyInstaller"""
@@ -67,6 +80,10 @@ gui_instance = None
 current_language = 'tr'
 language_texts = {}
 use_gpu = False  # Will be set after checking GPU availability
+_template_cache = {}  # Preprocessed templates, see prepare_template()
+_pts_index_cache = {}  # Loaded timestamp indexes, see load_pts_index()
+_template_scale_cache = {}  # Calibrated template scale per (template, resolution)
+_duration_cache = {}  # Container durations per (path, size, mtime), see container_duration()
 
 # Check if GPU is available for OpenCV
 def check_gpu_available():
@@ -97,15 +114,26 @@ def t(key, **kwargs):
         text = text.format(**kwargs)
     return text
 
+def get_config_path():
+    """Writable config path"""
+    # Yazılabilir config yolu: geliştirmede repo içi, EXE'de AppData
+    if getattr(sys, 'frozen', False):
+        appdata = os.getenv('APPDATA') or os.path.expanduser('~')
+        return os.path.join(appdata, 'EZClips', 'config.json')
+    return get_resource_path('req/jsons/config.json')
+
+def save_config(cfg):
+    """Save settings to config file, returns path"""
+    config_path = get_config_path()
+    os.makedirs(os.path.dirname(config_path), exist_ok=True)
+    with open(config_path, 'w', encoding='utf-8') as f:
+        json.dump(cfg, f, indent=4, ensure_ascii=False)
+    return config_path
+
 def load_config():
     """Load settings from config file"""
     try:
-        # Yazılabilir config yolu: geliştirmede repo içi, EXE'de AppData
-        if getattr(sys, 'frozen', False):
-            appdata = os.getenv('APPDATA') or os.path.expanduser('~')
-            config_path = os.path.join(appdata, 'EZClips', 'config.json')
-        else:
-            config_path = get_resource_path('req/jsons/config.json')
+        config_path = get_config_path()
         
         if os.path.exists(config_path):
             with open(config_path, 'r', encoding='utf-8') as f:
@@ -141,39 +169,358 @@ def load_config():
             'KILL_COLOR_UPPER2': [180, 255, 255],
             'MIN_COLOR_PIXELS': 150,
             'CANNY_THRESHOLD1': 150,
-            'CANNY_THRESHOLD2': 250
+            'CANNY_THRESHOLD2': 250,
+            'PERF_REPORTS': True,
+            'DECODE_SCALE': 1.0,
+            'USE_CHANGE_GATE': True,
+            'CHANGE_GATE_THRESHOLD': 1.5,
+            'USE_KILL_TRACKER': True,
+            'KILLFEED_ENTRY_LIFETIME': 5.0,
+            'AUTO_SCALE_TEMPLATE': True,
+            'TEMPLATE_REFERENCE_HEIGHT': 1080,
+            'TEMPLATE_CALIBRATION': False,
+            'USE_AUDIO_PREPASS': False,
+            'AUDIO_REFERENCE_PATH': '',
+            'AUDIO_MATCH_THRESHOLD': 0.6,
+            'AUDIO_WINDOW_BEFORE': 0.5,
+            'AUDIO_WINDOW_AFTER': 1.5,
+            'USE_COLOR_GATE': True,
+            'COLOR_GATE_SCALE': 0.5,
+            'COLOR_FILTER_BORDER': 0,
+            'MATCHER': 'ccoeff',
+            'CHAMFER_THRESHOLD': 0.8,
+            'CHAMFER_POINTS': 64,
+            'DETECT_BATCH_SIZE': 8,
+            'DETECT_WORKERS': 0,
+            'USE_ROI_CACHE': False,
+            'ROI_CACHE_FOLDER': 'roi_cache',
+            'CLIP_OUTPUT_MODE': 'copy',
+            'TIMELINE_FORMATS': list(timeline.TIMELINE_FORMATS),
+            'REENCODE_CODEC': 'libx264',
+            'REENCODE_PRESET': 'veryfast',
+            'REENCODE_CRF': 23,
+            'REENCODE_MAX_BITRATE': 0,
+            'REENCODE_MAX_SIZE_MB': 0,
+            'ENCODE_JOBS': 0,
+            'ENCODE_THREADS': 0,
+            'ENCODE_LOW_PRIORITY': True,
+            'MAX_CLIP_LENGTH': 0,
+            'MIN_CLIP_LENGTH': 0,
+            'USE_PTS_INDEX': True,
+            'BATCH_ORDER': 'name',
+            'BATCH_PRIORITIES': {},
+            'TELEMETRY_FORMAT': 'off',
+            'TELEMETRY_PATH': '',
+            'TELEMETRY_INTERVAL': 10.0
         }
 
 # Load configuration
 config = load_config()
 
+def apply_config(cfg):
+    """Apply settings from a config dict to module globals"""
+    global config, INPUT_FOLDER, OUTPUT_FOLDER, TEMPLATE_PATH
+    global THRESHOLD, BUFFER_BEFORE, BUFFER_AFTER, MIN_KILL_GAP, FRAME_SKIP
+    global KILL_COOLDOWN, USE_EDGE_DETECTION, USE_COLOR_FILTER, USE_ROI
+    global ROI_X_START, ROI_Y_START, ROI_X_END, ROI_Y_END
+    global KILL_COLOR_LOWER, KILL_COLOR_UPPER, KILL_COLOR_LOWER2, KILL_COLOR_UPPER2
+    global MIN_COLOR_PIXELS, CANNY_THRESHOLD1, CANNY_THRESHOLD2
+    global PERF_REPORTS, DECODE_SCALE
+    global USE_CHANGE_GATE, CHANGE_GATE_THRESHOLD
+    global USE_KILL_TRACKER, KILLFEED_ENTRY_LIFETIME
+    global AUTO_SCALE_TEMPLATE, TEMPLATE_REFERENCE_HEIGHT, TEMPLATE_CALIBRATION
+    global USE_AUDIO_PREPASS, AUDIO_REFERENCE_PATH, AUDIO_MATCH_THRESHOLD
+    global AUDIO_WINDOW_BEFORE, AUDIO_WINDOW_AFTER
+    global USE_COLOR_GATE, COLOR_GATE_SCALE, COLOR_FILTER_BORDER
+    global MATCHER, CHAMFER_THRESHOLD, CHAMFER_POINTS, DETECT_BATCH_SIZE, DETECT_WORKERS
+    global USE_ROI_CACHE, ROI_CACHE_FOLDER
+    global CLIP_OUTPUT_MODE, TIMELINE_FORMATS, REENCODE_CODEC, REENCODE_PRESET, REENCODE_CRF
+    global REENCODE_MAX_BITRATE, REENCODE_MAX_SIZE_MB
+    global ENCODE_JOBS, ENCODE_THREADS, ENCODE_LOW_PRIORITY
+    global MAX_CLIP_LENGTH, MIN_CLIP_LENGTH, USE_PTS_INDEX
+    global BATCH_ORDER, BATCH_PRIORITIES
+    global TELEMETRY_FORMAT, TELEMETRY_PATH, TELEMETRY_INTERVAL
+    
+    config = cfg
+    INPUT_FOLDER = config['INPUT_FOLDER']
+    OUTPUT_FOLDER = config['OUTPUT_FOLDER']
+    TEMPLATE_PATH = get_resource_path(config['TEMPLATE_PATH'].lstrip('./'))
+    THRESHOLD = config['THRESHOLD']
+    BUFFER_BEFORE = config['BUFFER_BEFORE']
+    BUFFER_AFTER = config['BUFFER_AFTER']
+    MIN_KILL_GAP = config['MIN_KILL_GAP']
+    FRAME_SKIP = config['FRAME_SKIP']
+    KILL_COOLDOWN = config['KILL_COOLDOWN']
+    USE_EDGE_DETECTION = config['USE_EDGE_DETECTION']
+    USE_COLOR_FILTER = config['USE_COLOR_FILTER']
+    USE_ROI = config['USE_ROI']
+    ROI_X_START = config['ROI_X_START']
+    ROI_Y_START = config['ROI_Y_START']
+    ROI_X_END = config['ROI_X_END']
+    ROI_Y_END = config['ROI_Y_END']
+    KILL_COLOR_LOWER = np.array(config['KILL_COLOR_LOWER'])
+    KILL_COLOR_UPPER = np.array(config['KILL_COLOR_UPPER'])
+    KILL_COLOR_LOWER2 = np.array(config['KILL_COLOR_LOWER2'])
+    KILL_COLOR_UPPER2 = np.array(config['KILL_COLOR_UPPER2'])
+    MIN_COLOR_PIXELS = config['MIN_COLOR_PIXELS']
+    CANNY_THRESHOLD1 = config.get('CANNY_THRESHOLD1', 150)
+    CANNY_THRESHOLD2 = config.get('CANNY_THRESHOLD2', 250)
+    PERF_REPORTS = config.get('PERF_REPORTS', True)
+    DECODE_SCALE = float(config.get('DECODE_SCALE', 1.0))
+    USE_CHANGE_GATE = config.get('USE_CHANGE_GATE', True)
+    CHANGE_GATE_THRESHOLD = config.get('CHANGE_GATE_THRESHOLD', 1.5)
+    USE_KILL_TRACKER = config.get('USE_KILL_TRACKER', True)
+    KILLFEED_ENTRY_LIFETIME = float(config.get('KILLFEED_ENTRY_LIFETIME', 5.0))
+    AUTO_SCALE_TEMPLATE = config.get('AUTO_SCALE_TEMPLATE', True)
+    TEMPLATE_REFERENCE_HEIGHT = int(config.get('TEMPLATE_REFERENCE_HEIGHT', 1080))
+    TEMPLATE_CALIBRATION = config.get('TEMPLATE_CALIBRATION', False)
+    USE_AUDIO_PREPASS = config.get('USE_AUDIO_PREPASS', False)
+    AUDIO_REFERENCE_PATH = config.get('AUDIO_REFERENCE_PATH', '')
+    if AUDIO_REFERENCE_PATH and not os.path.isabs(AUDIO_REFERENCE_PATH):
+        AUDIO_REFERENCE_PATH = get_resource_path(AUDIO_REFERENCE_PATH.lstrip('./'))
+    AUDIO_MATCH_THRESHOLD = float(config.get('AUDIO_MATCH_THRESHOLD', 0.6))
+    AUDIO_WINDOW_BEFORE = float(config.get('AUDIO_WINDOW_BEFORE', 0.5))
+    AUDIO_WINDOW_AFTER = float(config.get('AUDIO_WINDOW_AFTER', 1.5))
+    USE_COLOR_GATE = config.get('USE_COLOR_GATE', True)
+    COLOR_GATE_SCALE = float(config.get('COLOR_GATE_SCALE', 0.5))
+    COLOR_FILTER_BORDER = int(config.get('COLOR_FILTER_BORDER', 0))
+    MATCHER = config.get('MATCHER', 'ccoeff')
+    CHAMFER_THRESHOLD = float(config.get('CHAMFER_THRESHOLD', 0.8))
+    CHAMFER_POINTS = int(config.get('CHAMFER_POINTS', 64))
+    DETECT_BATCH_SIZE = int(config.get('DETECT_BATCH_SIZE', 8))
+    DETECT_WORKERS = int(config.get('DETECT_WORKERS', 0))
+    USE_ROI_CACHE = config.get('USE_ROI_CACHE', False)
+    ROI_CACHE_FOLDER = config.get('ROI_CACHE_FOLDER', 'roi_cache')
+    if not os.path.isabs(ROI_CACHE_FOLDER):
+        ROI_CACHE_FOLDER = get_data_path(ROI_CACHE_FOLDER)
+    CLIP_OUTPUT_MODE = config.get('CLIP_OUTPUT_MODE', 'copy')
+    TIMELINE_FORMATS = list(config.get('TIMELINE_FORMATS', timeline.TIMELINE_FORMATS))
+    REENCODE_CODEC = config.get('REENCODE_CODEC', 'libx264')
+    REENCODE_PRESET = config.get('REENCODE_PRESET', 'veryfast')
+    REENCODE_CRF = int(config.get('REENCODE_CRF', 23))
+    REENCODE_MAX_BITRATE = int(config.get('REENCODE_MAX_BITRATE', 0))
+    REENCODE_MAX_SIZE_MB = float(config.get('REENCODE_MAX_SIZE_MB', 0))
+    ENCODE_JOBS = int(config.get('ENCODE_JOBS', 0))
+    ENCODE_THREADS = int(config.get('ENCODE_THREADS', 0))
+    ENCODE_LOW_PRIORITY = config.get('ENCODE_LOW_PRIORITY', True)
+    MAX_CLIP_LENGTH = float(config.get('MAX_CLIP_LENGTH', 0))
+    MIN_CLIP_LENGTH = float(config.get('MIN_CLIP_LENGTH', 0))
+    USE_PTS_INDEX = config.get('USE_PTS_INDEX', True)
+    BATCH_ORDER = config.get('BATCH_ORDER', 'name')
+    BATCH_PRIORITIES = config.get('BATCH_PRIORITIES', {})
+    TELEMETRY_FORMAT = config.get('TELEMETRY_FORMAT', 'off')
+    TELEMETRY_PATH = config.get('TELEMETRY_PATH', '')
+    TELEMETRY_INTERVAL = float(config.get('TELEMETRY_INTERVAL', 10.0))
+
 # Get settings from config
-INPUT_FOLDER = config['INPUT_FOLDER']
-OUTPUT_FOLDER = config['OUTPUT_FOLDER']
-TEMPLATE_PATH = get_resource_path(config['TEMPLATE_PATH'].lstrip('./'))
+apply_config(config)
 PROCESSED_LOG = get_data_path("req/jsons/processed_videos.json")
-THRESHOLD = config['THRESHOLD']
-BUFFER_BEFORE = config['BUFFER_BEFORE']
-BUFFER_AFTER = config['BUFFER_AFTER']
-MIN_KILL_GAP = config['MIN_KILL_GAP']
-FRAME_SKIP = config['FRAME_SKIP']
-KILL_COOLDOWN = config['KILL_COOLDOWN']
-USE_EDGE_DETECTION = config['USE_EDGE_DETECTION']
-USE_COLOR_FILTER = config['USE_COLOR_FILTER']
-USE_ROI = config['USE_ROI']
-ROI_X_START = config['ROI_X_START']
-ROI_Y_START = config['ROI_Y_START']
-ROI_X_END = config['ROI_X_END']
-ROI_Y_END = config['ROI_Y_END']
-KILL_COLOR_LOWER = np.array(config['KILL_COLOR_LOWER'])
-KILL_COLOR_UPPER = np.array(config['KILL_COLOR_UPPER'])
-KILL_COLOR_LOWER2 = np.array(config['KILL_COLOR_LOWER2'])
-KILL_COLOR_UPPER2 = np.array(config['KILL_COLOR_UPPER2'])
-MIN_COLOR_PIXELS = config['MIN_COLOR_PIXELS']
-CANNY_THRESHOLD1 = config.get('CANNY_THRESHOLD1', 150)
-CANNY_THRESHOLD2 = config.get('CANNY_THRESHOLD2', 250)
+PTS_INDEX_FOLDER = get_data_path("pts_index")
+CHANGE_GATE_SIZE = (32, 16)  # Fingerprint size (width, height) for the change gate
+TRACKER_SIGNATURE_SIZE = (48, 8)  # Killfeed row appearance signature size
+TRACKER_MAX_APPEARANCE_DIFF = 12.0  # Mean gray difference for two sightings of the same row
+TEMPLATE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp']
+CALIBRATION_FRAMES = 12  # Frames sampled for template scale calibration
+CALIBRATION_STEPS = (0.8, 0.85, 0.9, 0.95, 1.0, 1.05, 1.1, 1.15, 1.2)  # Tried around the resolution ratio
+BATCH_PADDING = 16  # Rows between stacked ROIs, more than CHAMFER_TRUNCATE
+SCORE_DECIMALS = 4  # Match scores are compared at this precision; float noise differs between batch sizes
+DETECT_QUEUE_BYTES = 32 << 20  # Decoded ROIs (and preview frames) buffered ahead of the detector threads
+PREVIEW_MAX_WIDTH = 640  # Sampled frames kept for the preview are downscaled to this width (the GUI shows 410)
+CHAMFER_TRUNCATE = 8.0  # Pixels, edge distances beyond this count as a plain miss
+AUDIO_SAMPLE_RATE = 8000  # Hz, audio pre-pass works on mono PCM at this rate
+AUDIO_FFT_SIZE = 1 << 20  # Samples per FFT block for the audio correlation
+AUDIO_MIN_LEVEL = 0.05  # Windows quieter than this (relative to the reference) are ignored
+FINGERPRINT_SAMPLE_SIZE = 1 << 20  # Bytes hashed from both ends of a video
+ROI_CACHE_VERSION = 1  # Bump when the cache layout changes
+ROI_CACHE_SPARE_FRAMES = 16  # Extra slots in case CAP_PROP_FRAME_COUNT underestimates
+ENCODE_AUDIO_BITRATE = 160  # kbps per audio stream of re-encoded clips
+ENCODE_THREADS_PER_JOB = 4  # Encoder threads that still scale well; more cores run more clips at once
+ENCODE_NICENESS = 10  # POSIX nice value of encoder processes with ENCODE_LOW_PRIORITY
+ENCODE_SIZE_HEADROOM = 0.95  # Share of REENCODE_MAX_SIZE_MB budgeted for the streams (rest is container overhead)
+VFR_TOLERANCE = 0.001  # Seconds of frame-duration spread still treated as constant frame rate
+CLIP_JOIN_FRAMES = 1  # Clips at most this many frames apart are joined into one
+DEFAULT_FPS = 30.0  # Frame rate assumed where the video's is unknown
+KEYFRAME_SEEK_EPSILON = 0.001  # Seek just past a keyframe PTS so rounding cannot land on the one before
+PROGRESS_INTERVAL = 1.0  # Seconds between scan progress updates
+PROGRESS_WINDOW = 10.0  # Seconds of history behind the throughput and ETA figures
 VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv']
 
+class _StageTimer:
+    """Reusable context manager that adds elapsed time to a report stage"""
+    __slots__ = ('report', 'name', 'started')
+    
+    def __init__(self, report, name):
+        self.report = report
+        self.name = name
+        self.started = 0.0
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.report.add_time(self.name, time.perf_counter() - self.started)
+        return False
+
+# Pipeline counters of every report since start, read by the telemetry writer
+pipeline_counters = {}
+_pipeline_lock = threading.Lock()
+
+def pipeline_snapshot():
+    with _pipeline_lock:
+        return dict(pipeline_counters)
+
+class PerfReport:
+    """Per-video stage timings and pipeline counters (shared by the detection threads)"""
+    
+    def __init__(self, video_name):
+        self.video_name = video_name
+        self.stages = {}
+        self.counters = {}
+        self.settings = {}
+        self._timers = {}
+        self._lock = threading.Lock()
+        self.marks = {}
+        self.started = time.perf_counter()
+        self.finished = None
+    
+    def stage(self, name):
+        """Timer for a named stage, use as `with report.stage('canny'):`"""
+        # One timer per thread: stage times of parallel threads add up
+        key = (threading.get_ident(), name)
+        timer = self._timers.get(key)
+        if timer is None:
+            timer = self._timers[key] = _StageTimer(self, name)
+        return timer
+    
+    def add_time(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+    
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+        with _pipeline_lock:
+            pipeline_counters[name] = pipeline_counters.get(name, 0) + amount
+    
+    def mark(self, name):
+        """Remember when something first happened, e.g. `report.mark('first_clip')`"""
+        with self._lock:
+            self.marks.setdefault(name, time.perf_counter())
+    
+    def finish(self):
+        self.finished = time.perf_counter()
+    
+    @property
+    def wall_time(self):
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return end - self.started
+    
+    def to_dict(self):
+        wall = self.wall_time
+        return {
+            'video': self.video_name,
+            'wall_seconds': round(wall, 4),
+            'stages': {name: round(sec, 4) for name, sec in self.stages.items()},
+            'stage_share': {name: round(sec / wall, 4) if wall else 0.0 for name, sec in self.stages.items()},
+            'counters': dict(self.counters),
+            'marks': {name: round(at - self.started, 4) for name, at in self.marks.items()},
+            'settings': dict(self.settings),
+        }
+    
+    def log(self):
+        """Write report summary to the log"""
+        wall = self.wall_time
+        log_message(f"\n{t('log_perf_report')} ({wall:.2f}s)", "info")
+        for name, seconds in sorted(self.stages.items(), key=lambda item: item[1], reverse=True):
+            share = seconds / wall * 100 if wall else 0.0
+            log_message(f"   {name:<14} {seconds:8.3f}s  {share:5.1f}%", "info")
+        for name, value in self.counters.items():
+            log_message(f"   {name:<22} {value}", "info")
+    
+    def export(self, folder):
+        """Save report as JSON, returns file path"""
+        Path(folder).mkdir(parents=True, exist_ok=True)
+        base_name = os.path.splitext(self.video_name)[0]
+        report_path = os.path.join(folder, f"{base_name}_perf.json")
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        return report_path
+
+class BatchReport:
+    """Per-batch latency under a scheduling order: how soon clips reach the editors"""
+    
+    def __init__(self, order, video_files=()):
+        self.order = order
+        self.videos = []
+        self.video_files = list(video_files)
+        self._media = None
+        self.started = time.perf_counter()
+        self.finished = None
+    
+    @property
+    def media(self):
+        """Media length per video (container header), probed at the first batch ETA, not before the batch starts"""
+        if self._media is None:
+            self._media = {os.path.basename(path): container_duration(path) for path in self.video_files}
+        return self._media
+    
+    def eta(self, position, x_realtime):
+        """Seconds until the whole batch is scanned at `x_realtime`, `position` seconds into the current video"""
+        finished = sum(self.media.get(video['video'], 0.0) for video in self.videos)
+        return max(0.0, sum(self.media.values()) - finished - position) / x_realtime
+    
+    def add(self, report, clips):
+        """Record a finished video from its (finished) PerfReport"""
+        first_clip = report.marks.get('first_clip')
+        self.videos.append({
+            'video': report.video_name,
+            'clips': clips,
+            'completed_seconds': round(report.finished - self.started, 4),
+            'first_clip_seconds': round(first_clip - self.started, 4) if first_clip is not None else None,
+        })
+    
+    def finish(self):
+        self.finished = time.perf_counter()
+    
+    @property
+    def time_to_first_clip(self):
+        first_clips = [video['first_clip_seconds'] for video in self.videos if video['first_clip_seconds'] is not None]
+        return min(first_clips) if first_clips else None
+    
+    @property
+    def mean_completion(self):
+        if not self.videos:
+            return None
+        return sum(video['completed_seconds'] for video in self.videos) / len(self.videos)
+    
+    def to_dict(self):
+        end = self.finished if self.finished is not None else time.perf_counter()
+        mean_completion = self.mean_completion
+        return {
+            'order': self.order,
+            'wall_seconds': round(end - self.started, 4),
+            'time_to_first_clip_seconds': self.time_to_first_clip,
+            'mean_completion_seconds': round(mean_completion, 4) if mean_completion is not None else None,
+            'videos': self.videos,
+        }
+    
+    def log(self):
+        """Write batch latency summary to the log"""
+        first_clip = self.time_to_first_clip
+        mean_completion = self.mean_completion
+        log_message(f"\n{t('log_batch_report')} ({self.order})", "info")
+        log_message(f"   {t('log_time_to_first_clip')}: {f'{first_clip:.2f}s' if first_clip is not None else '-'}", "info")
+        log_message(f"   {t('log_mean_completion')}: {f'{mean_completion:.2f}s' if mean_completion is not None else '-'}", "info")
+    
+    def export(self, folder):
+        """Save report as JSON, returns file path"""
+        Path(folder).mkdir(parents=True, exist_ok=True)
+        report_path = os.path.join(folder, f"batch_{time.strftime('%Y%m%d_%H%M%S')}_{self.order}.json")
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        return report_path
+
 def log_message(message, level='info'):
     """Send log message to GUI"""
     if gui_instance:
@@ -189,6 +536,74 @@ def show_preview(frame):
     if gui_instance:
         gui_instance.update_preview(frame)
 
+def preview_enabled():
+    """Whether the output shows preview frames (outputs without a preview set shows_preview = False)"""
+    return gui_instance is not None and getattr(gui_instance, 'shows_preview', True)
+
+class ThroughputMeter:
+    """Frames and media seconds per wall second over a moving window, reported on a time cadence"""
+    
+    def __init__(self, window=PROGRESS_WINDOW, interval=PROGRESS_INTERVAL):
+        self.window = window
+        self.interval = interval
+        self.samples = deque()
+        self.last_report = time.perf_counter()
+    
+    def add(self, frames, media_seconds):
+        """Record the scan position, returns True when the next progress update is due"""
+        now = time.perf_counter()
+        self.samples.append((now, frames, media_seconds))
+        # Keep one sample at least `window` old so the rate always spans the full window
+        while len(self.samples) > 2 and now - self.samples[1][0] >= self.window:
+            self.samples.popleft()
+        if now - self.last_report < self.interval:
+            return False
+        self.last_report = now
+        return True
+    
+    def rates(self):
+        """(frames per second, media seconds per wall second), None before two samples"""
+        if len(self.samples) < 2:
+            return None
+        (start, frames_start, media_start), (end, frames_end, media_end) = self.samples[0], self.samples[-1]
+        if end <= start:
+            return None
+        return (frames_end - frames_start) / (end - start), (media_end - media_start) / (end - start)
+
+def format_eta(seconds):
+    """H:MM:SS or M:SS"""
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+def report_scan_progress(meter, video_name, frame_count, total_frames, position, duration, batch=None,
+                         remaining=None):
+    """Progress bar update and 'throughput' event with decode rate, x-realtime and ETAs
+    (remaining: media seconds still to scan, less than duration - position when audio windows skip the rest)"""
+    text = f"{t('progress_scanning')}: {position:.1f}s / {duration:.1f}s"
+    if remaining is None:
+        remaining = duration - position
+    rates = meter.rates()
+    fps_rate = x_realtime = eta = batch_eta = None
+    if rates is not None and rates[1] > 0:
+        fps_rate, x_realtime = rates
+        eta = max(0.0, remaining) / x_realtime
+        text += f" • {fps_rate:.0f} fps • {x_realtime:.1f}x • ETA {format_eta(eta)}"
+        if batch is not None and len(batch.video_files) > 1:
+            batch_eta = batch.eta(duration - remaining, x_realtime)
+            text += f" ({t('progress_batch_eta')} {format_eta(batch_eta)})"
+    update_progress(frame_count, total_frames, text)
+    emit_event('throughput', video=video_name, position=round(position, 3), duration=round(duration, 3),
+               fps=round(fps_rate, 1) if fps_rate is not None else None,
+               x_realtime=round(x_realtime, 2) if x_realtime is not None else None,
+               eta_seconds=round(eta, 1) if eta is not None else None,
+               batch_eta_seconds=round(batch_eta, 1) if batch_eta is not None else None)
+
+def emit_event(event, **data):
+    """Structured pipeline event (kill found, clip saved) for listeners that want more than log lines"""
+    if gui_instance and hasattr(gui_instance, 'add_event'):
+        gui_instance.add_event(event, data)
+
 def create_output_folder():
     """Create output folder"""
     Path(OUTPUT_FOLDER).mkdir(exist_ok=True)
@@ -237,22 +652,1013 @@ def get_video_files(folder):
         for video in skipped_videos:
             log_message(f"   - {video}", "warning")
     
-    return sorted(video_files)
+    return order_videos(video_files)
+
+BATCH_ORDERS = ('name', 'shortest', 'smallest', 'newest')
+
+def video_priority(video_path):
+    """Highest BATCH_PRIORITIES value whose file name pattern matches the video (0 if none)"""
+    name = os.path.basename(video_path).lower()
+    matches = [int(priority) for pattern, priority in BATCH_PRIORITIES.items() if fnmatch.fnmatch(name, pattern.lower())]
+    return max(matches) if matches else 0
+
+def order_videos(video_files, order=None):
+    """Processing order of a batch: higher priority first, then by the BATCH_ORDER policy"""
+    order = order or BATCH_ORDER
+    if order == 'shortest':
+        # Container header only: building PTS indexes up front would delay the first clip
+        policy_key = container_duration
+    elif order == 'smallest':
+        policy_key = os.path.getsize
+    elif order == 'newest':
+        policy_key = lambda path: -os.path.getmtime(path)
+    else:
+        policy_key = lambda path: 0
+    return sorted(video_files, key=lambda path: (-video_priority(path), policy_key(path), path))
+
+class KillfeedTracker:
+    """Follows killfeed rows across sampled frames by position and appearance"""
+    
+    def __init__(self, entry_lifetime, sample_interval, row_height):
+        # first_seen is the first sample that showed the entry, which appeared up to one sample
+        # interval earlier. Tracks age from half an interval before it (the expected appearance),
+        # so a stale track does not take the row of a new identical entry; the 1e-3 absorbs PTS
+        # rounding and keeps a sighting exactly at the limit on its track
+        self.entry_lifetime = entry_lifetime - sample_interval / 2 + 1e-3
+        # Keep a track through one missed sample before dropping it
+        self.max_gap = 2 * sample_interval + 1e-6
+        self.row_height = max(1, row_height)
+        self.tracks = []
+    
+    def update(self, rows, now):
+        """Match this frame's rows to known entries, return rows that are new"""
+        # An entry cannot outlive the killfeed lifetime, older tracks are gone
+        self.tracks = [track for track in self.tracks
+                       if now - track['last_seen'] <= self.max_gap
+                       and now - track['first_seen'] < self.entry_lifetime]
+        
+        # Greedy assignment, cheapest (most similar, least moved) pairs first
+        pairs = []
+        for row_index, (_, y, _, signature, _) in enumerate(rows):
+            for track_index, track in enumerate(self.tracks):
+                appearance = float(np.mean(cv2.absdiff(signature, track['signature'])))
+                if appearance > TRACKER_MAX_APPEARANCE_DIFF:
+                    continue
+                shift = abs(y - track['y']) / self.row_height
+                pairs.append((appearance + 4.0 * shift, row_index, track_index))
+        pairs.sort()
+        
+        matched_rows = set()
+        matched_tracks = set()
+        for _, row_index, track_index in pairs:
+            if row_index in matched_rows or track_index in matched_tracks:
+                continue
+            matched_rows.add(row_index)
+            matched_tracks.add(track_index)
+            track = self.tracks[track_index]
+            track['y'] = rows[row_index][1]
+            track['signature'] = rows[row_index][3]
+            track['last_seen'] = now
+        
+        new_rows = []
+        for row_index, row in enumerate(rows):
+            if row_index in matched_rows:
+                continue
+            self.tracks.append({'y': row[1], 'signature': row[3], 'first_seen': now, 'last_seen': now})
+            new_rows.append(row)
+        return sorted(new_rows, key=lambda row: row[1])
+
+def killfeed_signature(region):
+    """Tiny grayscale thumbnail identifying a killfeed row"""
+    gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, TRACKER_SIGNATURE_SIZE, interpolation=cv2.INTER_AREA)
+
+def list_template_files(template_path):
+    """Template image(s): a single file or every image in a directory"""
+    if os.path.isdir(template_path):
+        return sorted(os.path.join(template_path, f) for f in os.listdir(template_path)
+                      if f.lower().endswith(tuple(TEMPLATE_EXTENSIONS)))
+    return [template_path]
+
+def prepare_template(path, scale=1.0, canny_detector=None):
+    """Load one template, resize it and compute its edges (cached)"""
+    key = (os.path.abspath(path), os.path.getmtime(path), scale, USE_EDGE_DETECTION,
+           CANNY_THRESHOLD1, CANNY_THRESHOLD2, canny_detector is not None, CHAMFER_POINTS)
+    cached = _template_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    image = cv2.imread(path)
+    if image is None:
+        return None
+    if scale != 1.0:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    
+    edges = None
+    if USE_EDGE_DETECTION:
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        if canny_detector is not None:
+            try:
+                # GPU: same Canny implementation as the frames
+                gpu_gray = cv2.cuda_GpuMat()
+                gpu_gray.upload(gray)
+                edges = canny_detector.detect(gpu_gray).download()
+            except:
+                edges = None
+        if edges is None:
+            edges = cv2.Canny(gray, CANNY_THRESHOLD1, CANNY_THRESHOLD2)
+    
+    # Sparse edge points for the chamfer matcher, evenly thinned to CHAMFER_POINTS
+    points = np.argwhere(edges > 0) if edges is not None else np.empty((0, 2), dtype=np.intp)
+    if len(points) > CHAMFER_POINTS > 0:
+        points = points[np.linspace(0, len(points) - 1, CHAMFER_POINTS).astype(int)]
+    
+    entry = {
+        'name': os.path.splitext(os.path.basename(path))[0],
+        'image': image,
+        'edges': edges,
+        'h': image.shape[0],
+        'w': image.shape[1],
+        'points': points,
+    }
+    _template_cache[key] = entry
+    return entry
+
+def load_templates(template_path, scale=1.0, canny_detector=None):
+    """Load the template library (single file or directory)"""
+    templates = []
+    for path in list_template_files(template_path):
+        try:
+            entry = prepare_template(path, scale, canny_detector)
+        except OSError:
+            entry = None
+        if entry is None:
+            log_message(f"{t('log_template_error')}: {path}", "error")
+            continue
+        templates.append(entry)
+    return templates
+
+def get_template_scale(video_path, template_path, frame_width, frame_height):
+    """Template scale for this video's resolution (cached per resolution)"""
+    if not AUTO_SCALE_TEMPLATE:
+        return 1.0
+    # CS2's HUD scales with the vertical resolution
+    base_scale = round(frame_height / TEMPLATE_REFERENCE_HEIGHT, 4)
+    if not TEMPLATE_CALIBRATION:
+        return base_scale
+    
+    key = (os.path.abspath(template_path), frame_width, frame_height)
+    if key not in _template_scale_cache:
+        _template_scale_cache[key] = calibrate_template_scale(video_path, template_path, base_scale)
+    return _template_scale_cache[key]
+
+def calibrate_template_scale(video_path, template_path, base_scale):
+    """Pick the template scale that matches best on a few sampled frames"""
+    cap = cv2.VideoCapture(video_path)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    search_images = []
+    for i in range(CALIBRATION_FRAMES):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(total_frames * (i + 0.5) / CALIBRATION_FRAMES))
+        ret, frame = cap.read()
+        if not ret:
+            continue
+        if USE_ROI:
+            h, w = frame.shape[:2]
+            frame = frame[int(h * ROI_Y_START):int(h * ROI_Y_END), int(w * ROI_X_START):int(w * ROI_X_END)]
+        if USE_EDGE_DETECTION:
+            frame = cv2.Canny(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), CANNY_THRESHOLD1, CANNY_THRESHOLD2)
+        search_images.append(frame)
+    cap.release()
+    
+    best_scale, best_score = base_scale, -1.0
+    for step in CALIBRATION_STEPS:
+        scale = round(base_scale * step, 4)
+        for tp in load_templates(template_path, scale):
+            template = tp['edges'] if USE_EDGE_DETECTION else tp['image']
+            if USE_EDGE_DETECTION and not cv2.countNonZero(template):
+                continue
+            for image in search_images:
+                if tp['h'] > image.shape[0] or tp['w'] > image.shape[1]:
+                    continue
+                score = cv2.minMaxLoc(cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED))[1]
+                if score > best_score:
+                    best_scale, best_score = scale, score
+    
+    # No killfeed in the sampled frames: the peak is noise, keep the resolution ratio
+    if best_score < THRESHOLD:
+        log_message(t('log_template_calibration_failed', scale=base_scale), "warning")
+        return base_scale
+    log_message(t('log_template_calibrated', scale=best_scale, score=best_score), "info")
+    return best_scale
+
+def get_decode_scale():
+    """Effective decode scale (downscaling the sampled frames needs FFmpeg)"""
+    if DECODE_SCALE >= 1.0:
+        return 1.0
+    if not shutil.which('ffmpeg'):
+        log_message(t('log_decode_scale_no_ffmpeg'), "warning")
+        return 1.0
+    return DECODE_SCALE
+
+def scaled_frame_size(width, height, scale):
+    """Frame size after downscaling (even numbers for the decoder)"""
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+
+def iter_sampled_frames(cap, report, windows=None):
+    """Yield (frame_count, frame) for every FRAME_SKIP-th frame with OpenCV (optionally only inside frame windows)"""
+    decoded = 0
+    decode = report.stage('decode')
+    try:
+        for start, end in windows or [(0, None)]:
+            frame_count = start
+            if start:
+                with decode:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+            while cap.isOpened() and (end is None or frame_count < end):
+                # grab() decodes, retrieve() converts/copies only the frames we analyze
+                with decode:
+                    ret = cap.grab()
+                if not ret:
+                    break
+                frame_count += 1
+                decoded += 1
+                
+                # FRAME_SKIP kadar frame atla
+                if frame_count % FRAME_SKIP != 0:
+                    continue
+                
+                with decode:
+                    ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                # Counted as we go so telemetry sees a live decode rate
+                report.count('frames_decoded', decoded)
+                decoded = 0
+                yield frame_count, frame
+    finally:
+        report.count('frames_decoded', decoded)
+
+def iter_sampled_frames_ffmpeg(video_path, width, height, report, fps=None, windows=None, frame_times=None):
+    """Yield (frame_count, frame) for every FRAME_SKIP-th frame, downscaled by FFmpeg"""
+    # select drops unsampled frames inside FFmpeg so only analyzed frames cross the pipe.
+    # No -lowres: its DCT-domain decimation washes out the thin red killfeed borders
+    frame_size = width * height * 3
+    decode = report.stage('decode')
+    for start, end in windows or [(0, None)]:
+        cmd = ['ffmpeg', '-v', 'error']
+        # Window edges are frame numbers; the PTS index turns them into exact seek times
+        start_time = index_time(start, fps, frame_times)
+        if start:
+            cmd += ['-ss', f"{start_time:.6f}"]
+        if end is not None:
+            cmd += ['-t', f"{index_time(end, fps, frame_times) - start_time:.6f}"]
+        cmd += [
+            '-i', video_path,
+            '-map', '0:v:0',
+            '-vf', f"select='not(mod(n+{start + 1}\\,{FRAME_SKIP}))',scale={width}:{height}:flags=area",
+            '-fps_mode', 'passthrough',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24',
+            '-'
+        ]
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=frame_size)
+        # First sampled frame number after the window start
+        frame_count = (start // FRAME_SKIP + 1) * FRAME_SKIP
+        counted = 0
+        try:
+            while True:
+                with decode:
+                    data = process.stdout.read(frame_size)
+                if len(data) < frame_size:
+                    break
+                frame = np.frombuffer(data, dtype=np.uint8).reshape((height, width, 3))
+                # Frames decoded through this sample, counted as we go so telemetry sees a live decode rate
+                report.count('frames_decoded', frame_count - start - counted)
+                counted = frame_count - start
+                yield frame_count, frame
+                frame_count += FRAME_SKIP
+        finally:
+            process.stdout.close()
+            process.kill()
+            process.wait()
+
+def build_pts_index(video_path):
+    """Demux the first video stream with FFmpeg, returns (frame PTS, keyframe PTS) in seconds or None"""
+    # framecrc lists every packet without decoding; timestamps start at the file start like -ss
+    cmd = ['ffmpeg', '-v', 'error', '-i', video_path, '-map', '0:v:0', '-c', 'copy', '-f', 'framecrc', '-']
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    except OSError:
+        return None
+    if result.returncode != 0:
+        return None
+    
+    time_base = None
+    pts = []
+    keyframes = []
+    for line in result.stdout.splitlines():
+        if line.startswith('#tb 0:'):
+            num, den = line.split(':', 1)[1].strip().split('/')
+            time_base = int(num) / int(den)
+        elif line and not line.startswith('#'):
+            fields = [field.strip() for field in line.split(',')]
+            packet_pts = int(fields[2])
+            if packet_pts == -(1 << 63):
+                continue
+            pts.append(packet_pts)
+            # Flags are only printed when they differ from a plain keyframe
+            flags = next((int(field[2:], 16) for field in fields[6:] if field.startswith('F=')), 1)
+            if flags & 1:
+                keyframes.append(packet_pts)
+    if time_base is None or not pts:
+        return None
+    # Packets come in decode order, frame numbers follow presentation order
+    return np.sort(np.array(pts, dtype=np.float64)) * time_base, np.sort(np.array(keyframes, dtype=np.float64)) * time_base
+
+def load_pts_index(video_path):
+    """(frame PTS, keyframe PTS) of a video, built once and kept on disk by content fingerprint; None if unavailable"""
+    stat = os.stat(video_path)
+    key = (os.path.abspath(video_path), stat.st_mtime_ns, stat.st_size)
+    if key in _pts_index_cache:
+        return _pts_index_cache[key]
+    
+    index_path = os.path.join(PTS_INDEX_FOLDER, f"{Path(video_path).stem}_{video_fingerprint(video_path)[:16]}.npz")
+    try:
+        with np.load(index_path) as data:
+            index = data['frame_times'], data['keyframes']
+    except (OSError, ValueError, KeyError):
+        index = build_pts_index(video_path)
+        if index is not None:
+            os.makedirs(PTS_INDEX_FOLDER, exist_ok=True)
+            # Per-process temp name: several processes may index the same video at once
+            temp_path = index_path[:-len('.npz')] + f'.{os.getpid()}.tmp.npz'
+            np.savez_compressed(temp_path, frame_times=index[0], keyframes=index[1])
+            os.replace(temp_path, index_path)
+    _pts_index_cache[key] = index
+    return index
+
+def index_time(frame_index, fps, frame_times=None):
+    """Start time of a 0-based frame index: its PTS with an index, frame_index / fps without"""
+    if frame_times is not None and 0 <= frame_index < len(frame_times):
+        return float(frame_times[frame_index])
+    return frame_index / fps
+
+def frame_time(frame_count, fps, frame_times=None):
+    """Timestamp of the frame_count-th decoded frame: its PTS with an index, frame_count / fps without"""
+    if frame_times is not None and 0 < frame_count <= len(frame_times):
+        return float(frame_times[frame_count - 1])
+    return frame_count / fps
+
+def time_to_frame(seconds, fps, frame_times=None):
+    """Number of frames that start before the given time"""
+    if frame_times is not None:
+        return int(np.searchsorted(frame_times, seconds))
+    return int(np.ceil(seconds * fps))
+
+def index_duration(frame_times):
+    """Presentation length of an indexed video: last PTS plus a typical frame duration"""
+    if len(frame_times) < 2:
+        return float(frame_times[-1]) if len(frame_times) else 0.0
+    return float(frame_times[-1] + np.median(np.diff(frame_times)))
+
+def video_fingerprint(path):
+    """Content fingerprint of a video file: its size plus a hash of the first and last MiB"""
+    size = os.path.getsize(path)
+    digest = hashlib.sha1(str(size).encode())
+    with open(path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_SAMPLE_SIZE))
+        if size > FINGERPRINT_SAMPLE_SIZE:
+            f.seek(max(FINGERPRINT_SAMPLE_SIZE, size - FINGERPRINT_SAMPLE_SIZE))
+            digest.update(f.read(FINGERPRINT_SAMPLE_SIZE))
+    return digest.hexdigest()
+
+def roi_cache_paths(video_path, roi, frame_size):
+    """(array, sidecar) paths of the ROI cache for this video content, ROI, decode size and FRAME_SKIP"""
+    key = json.dumps({
+        'video': video_fingerprint(video_path),
+        'roi': list(roi),
+        'frame_size': list(frame_size),
+        'frame_skip': FRAME_SKIP,
+        'version': ROI_CACHE_VERSION,
+    }, sort_keys=True)
+    name = f"{Path(video_path).stem}_{hashlib.sha1(key.encode()).hexdigest()[:16]}"
+    return os.path.join(ROI_CACHE_FOLDER, name + '.npy'), os.path.join(ROI_CACHE_FOLDER, name + '.json')
+
+def load_roi_cache(array_path, sidecar_path):
+    """Memory-map a completed ROI cache, returns (crops, frame indexes) or None"""
+    try:
+        with open(sidecar_path, 'r', encoding='utf-8') as f:
+            sidecar = json.load(f)
+        crops = np.load(array_path, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+    frame_indexes = sidecar.get('frames', [])
+    if len(crops) < len(frame_indexes):
+        return None
+    return crops, frame_indexes
+
+def iter_roi_cache(crops, frame_indexes, report, windows=None):
+    """Yield (frame_count, roi) from a memory-mapped ROI cache (optionally only inside frame windows)"""
+    cached = 0
+    try:
+        for i, frame_count in enumerate(frame_indexes):
+            if windows is not None and not any(start < frame_count <= end for start, end in windows):
+                continue
+            cached += 1
+            yield frame_count, crops[i]
+    finally:
+        report.count('frames_from_cache', cached)
+
+def iter_roi_cache_writer(frames, roi, array_path, sidecar_path, capacity, fps, report, frame_times=None):
+    """Pass (frame_count, frame) through while storing ROI crops; the sidecar marks a completed scan"""
+    x1, y1, x2, y2 = roi
+    os.makedirs(os.path.dirname(array_path), exist_ok=True)
+    if os.path.exists(sidecar_path):
+        os.remove(sidecar_path)
+    crops = np.lib.format.open_memmap(array_path, mode='w+', dtype=np.uint8,
+                                      shape=(capacity, y2 - y1, x2 - x1, 3))
+    frame_indexes = []
+    completed = False
+    try:
+        for frame_count, frame in frames:
+            if len(frame_indexes) < capacity:
+                with report.stage('cacheWrite'):
+                    crops[len(frame_indexes)] = frame[y1:y2, x1:x2]
+            frame_indexes.append(frame_count)
+            yield frame_count, frame
+        completed = len(frame_indexes) <= capacity
+    finally:
+        crops.flush()
+        del crops
+        if completed:
+            sidecar = {
+                'version': ROI_CACHE_VERSION,
+                'roi': [x1, y1, x2, y2],
+                'fps': fps,
+                'frame_skip': FRAME_SKIP,
+                'frames': frame_indexes,
+                'timestamps': [round(frame_time(frame_count, fps, frame_times), 6) for frame_count in frame_indexes],
+            }
+            # Written last and atomically: an interrupted scan leaves no sidecar behind
+            temp_path = f"{sidecar_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(sidecar, f)
+            os.replace(temp_path, sidecar_path)
+        else:
+            try:
+                os.remove(array_path)
+            except OSError:
+                pass
+
+def iter_roi_frames(frames, roi, report, keep_frames=False):
+    """Crop the search region and apply the change gate, yields (frame_count, frame, search_frame, gated).
+    frame is None unless keep_frames (then a preview-sized copy): only the crop travels on, the decoded frame can be freed"""
+    gate_fingerprint = None
+    for frame_count, frame in frames:
+        # Use ROI (only check killfeed region)
+        if roi is not None:
+            x1, y1, x2, y2 = roi
+            # A copy, a view would keep the whole frame alive
+            search_frame = np.ascontiguousarray(frame[y1:y2, x1:x2])
+        else:
+            search_frame = frame
+        if not keep_frames:
+            frame = None
+        elif frame.shape[1] > PREVIEW_MAX_WIDTH:
+            preview_scale = PREVIEW_MAX_WIDTH / frame.shape[1]
+            frame = cv2.resize(frame, None, fx=preview_scale, fy=preview_scale, interpolation=cv2.INTER_LINEAR)
+        
+        # Change gate: skip matching while the killfeed region looks the same
+        gated = False
+        if USE_CHANGE_GATE:
+            with report.stage('changeGate'):
+                fingerprint = cv2.resize(search_frame, CHANGE_GATE_SIZE, interpolation=cv2.INTER_AREA)
+                if gate_fingerprint is not None:
+                    difference = cv2.norm(fingerprint, gate_fingerprint, cv2.NORM_L1) / fingerprint.size
+                    gated = difference < CHANGE_GATE_THRESHOLD
+                if gated:
+                    report.count('frames_gated')
+                else:
+                    gate_fingerprint = fingerprint
+        yield frame_count, frame, search_frame, gated
+
+def iter_batches(frames, size):
+    """Group sampled frame entries into lists of up to size"""
+    batch = []
+    for item in frames:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _put_until_stopped(buffer, item, stop):
+    """Blocking put that gives up once stop is set"""
+    while not stop.is_set():
+        try:
+            buffer.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def iter_in_thread(items, maxsize):
+    """Run an iterator on a background thread, buffering up to maxsize items ahead of the consumer"""
+    buffer = queue.Queue(maxsize)
+    stop = threading.Event()
+    
+    def produce():
+        error = None
+        try:
+            for item in items:
+                if not _put_until_stopped(buffer, (True, item), stop):
+                    break
+        except Exception as e:
+            error = e
+        finally:
+            if hasattr(items, 'close'):
+                items.close()
+        _put_until_stopped(buffer, (False, error), stop)
+    
+    thread = threading.Thread(target=produce, name='decoder', daemon=True)
+    thread.start()
+    try:
+        while True:
+            has_item, value = buffer.get()
+            if not has_item:
+                if value is not None:
+                    raise value
+                return
+            yield value
+    finally:
+        stop.set()
+        thread.join()
+
+def get_detect_workers():
+    """Detector threads for one video (DETECT_WORKERS, 0 = one per core, up to 4; never more than the cores)"""
+    cores = os.cpu_count() or 1
+    if DETECT_WORKERS > 0:
+        # Threads beyond the cores only add contention and buffered frames
+        return min(DETECT_WORKERS, cores)
+    return max(1, min(4, cores))
+
+def detect_queue_batches(entry_bytes, batch_size):
+    """Batches the decoder may buffer ahead, DETECT_QUEUE_BYTES worth of entries (at least one batch)"""
+    return max(1, DETECT_QUEUE_BYTES // max(1, entry_bytes * batch_size))
+
+def iter_detected_batches(batches, matcher, workers):
+    """Yield (batch, rows) in frame order, detecting up to workers + 1 batches in parallel"""
+    if workers <= 1:
+        for batch in batches:
+            yield batch, matcher.detect(batch)
+        return
+    
+    # OpenCV releases the GIL, so detector threads run on separate cores
+    pool = ThreadPoolExecutor(workers, thread_name_prefix='detector')
+    pending = deque()
+    try:
+        for batch in batches:
+            pending.append((batch, pool.submit(matcher.detect, batch)))
+            # Hand results back in submission order, so the tracker sees frames in time order
+            while pending and (len(pending) > workers or pending[0][1].done()):
+                done_batch, future = pending.popleft()
+                yield done_batch, future.result()
+        while pending:
+            done_batch, future = pending.popleft()
+            yield done_batch, future.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def decode_audio(path):
+    """Decode the first audio stream as mono float32 PCM at AUDIO_SAMPLE_RATE (None if unavailable)"""
+    cmd = [
+        'ffmpeg', '-v', 'error',
+        '-i', path,
+        '-map', '0:a:0',
+        '-ac', '1', '-ar', str(AUDIO_SAMPLE_RATE),
+        '-f', 's16le',
+        '-'
+    ]
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except OSError:
+        return None
+    if result.returncode != 0 or not result.stdout:
+        return None
+    return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
+def stream_audio(path, chunk_samples):
+    """Decode the first audio stream like decode_audio, yielding chunks of up to chunk_samples samples.
+    Nothing is yielded if the file has no readable audio."""
+    cmd = [
+        'ffmpeg', '-v', 'error',
+        '-i', path,
+        '-map', '0:a:0',
+        '-ac', '1', '-ar', str(AUDIO_SAMPLE_RATE),
+        '-f', 's16le',
+        '-'
+    ]
+    try:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except OSError:
+        return
+    try:
+        while True:
+            data = process.stdout.read(chunk_samples * 2)
+            if len(data) < 2:
+                break
+            yield np.frombuffer(data, dtype=np.int16, count=len(data) // 2).astype(np.float32) / 32768.0
+    finally:
+        # Stopped early (error, cancelled scan): don't leave FFmpeg decoding
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+
+def correlate_audio_block(block, ref_fft, nfft, m, ref_norm):
+    """Normalized correlation scores at the len(block) - m + 1 full offsets of one block"""
+    n_out = len(block) - m + 1
+    corr = np.fft.irfft(np.fft.rfft(block, nfft) * ref_fft, nfft)[:n_out]
+    
+    # Reference is zero-mean, so only the variance of each signal window is needed
+    sums = np.concatenate(([0.0], np.cumsum(block, dtype=np.float64)))
+    squares = np.concatenate(([0.0], np.cumsum(np.square(block, dtype=np.float64))))
+    window_sum = sums[m:] - sums[:-m]
+    window_var = np.maximum(squares[m:] - squares[:-m] - window_sum * window_sum / m, 0.0)
+    window_std = np.sqrt(window_var)
+    
+    # Near-silent windows would match any shape after normalization
+    floor = AUDIO_MIN_LEVEL * ref_norm
+    scores = np.zeros(n_out, dtype=np.float32)
+    loud = window_std > floor
+    scores[loud] = corr[loud] / (window_std[loud] * ref_norm)
+    return scores
+
+def correlate_audio(chunks, reference):
+    """Normalized cross-correlation of the reference at every offset of a streamed signal (FFT, overlap-save).
+    Yields (first offset, scores) per block; memory stays at a few FFT blocks for any signal length."""
+    m = len(reference)
+    ref = reference.astype(np.float64) - reference.mean()
+    ref_norm = np.linalg.norm(ref)
+    if ref_norm == 0:
+        return
+    
+    nfft = 1 << int(np.ceil(np.log2(max(AUDIO_FFT_SIZE, 2 * m))))
+    step = nfft - m + 1
+    ref_fft = np.conj(np.fft.rfft(ref, nfft))
+    buffer = np.zeros(0, dtype=np.float32)
+    pos = 0
+    for chunk in chunks:
+        buffer = np.concatenate((buffer, chunk))
+        while len(buffer) >= nfft:
+            yield pos, correlate_audio_block(buffer[:nfft], ref_fft, nfft, m, ref_norm)
+            # The last m - 1 samples start offsets of the next block
+            buffer = buffer[step:]
+            pos += step
+    if len(buffer) >= m:
+        yield pos, correlate_audio_block(buffer, ref_fft, nfft, m, ref_norm)
+
+def find_audio_candidates(video_path, reference_path, report):
+    """Candidate kill times (seconds) where the audio matches the reference kill sound, None if unavailable"""
+    with report.stage('audioPrepass'):
+        reference = decode_audio(reference_path)
+        if reference is None or len(reference) == 0:
+            log_message(f"{t('log_audio_reference_error')}: {reference_path}", "warning")
+            return None
+        chunks = stream_audio(video_path, AUDIO_FFT_SIZE // 2)
+        try:
+            first = next(chunks, None)
+            if first is None:
+                log_message(t('log_audio_no_track'), "warning")
+                return None
+            # Only offsets above the threshold are kept, the scores of a multi-hour VOD never are
+            hits, hit_scores = [], []
+            for offset, scores in correlate_audio(itertools.chain([first], chunks), reference):
+                above = np.flatnonzero(scores >= AUDIO_MATCH_THRESHOLD)
+                hits.append(above + offset)
+                hit_scores.append(scores[above])
+        finally:
+            chunks.close()
+    
+    # One candidate per burst of matches: the strongest offset
+    hits = np.concatenate(hits) if hits else np.zeros(0, dtype=np.int64)
+    hit_scores = np.concatenate(hit_scores) if hit_scores else np.zeros(0, dtype=np.float32)
+    candidates = []
+    if len(hits):
+        for group in np.split(np.arange(len(hits)), np.flatnonzero(np.diff(hits) > len(reference)) + 1):
+            candidates.append(float(hits[group[np.argmax(hit_scores[group])]]) / AUDIO_SAMPLE_RATE)
+    report.count('audio_candidates', len(candidates))
+    return candidates
+
+def audio_scan_windows(candidates, fps, total_frames, frame_times=None):
+    """Frame windows (start, end] around audio candidates"""
+    windows = []
+    for candidate in sorted(candidates):
+        if frame_times is not None:
+            start = time_to_frame(candidate - AUDIO_WINDOW_BEFORE, fps, frame_times)
+            end = min(total_frames, time_to_frame(candidate + AUDIO_WINDOW_AFTER, fps, frame_times))
+        else:
+            start = max(0, int((candidate - AUDIO_WINDOW_BEFORE) * fps))
+            end = min(total_frames, int(np.ceil((candidate + AUDIO_WINDOW_AFTER) * fps)))
+        # Every window holds at least one sampled frame
+        end = min(total_frames, max(end, start + FRAME_SKIP))
+        # Merge while the previous killfeed entry is still on screen, so the tracker keeps it
+        if windows and start - windows[-1][1] < KILLFEED_ENTRY_LIFETIME * fps:
+            windows[-1][1] = max(windows[-1][1], end)
+        else:
+            windows.append([start, end])
+    return [(start, end) for start, end in windows]
+
+def chamfer_distance_map(edges):
+    """Distance of every pixel to the nearest edge, truncated at CHAMFER_TRUNCATE"""
+    distance = cv2.distanceTransform(cv2.bitwise_not(edges), cv2.DIST_L2, 3)
+    return np.minimum(distance, CHAMFER_TRUNCATE, out=distance)
+
+def chamfer_scores(distance_map, template):
+    """Chamfer score of every placement (1 = all template edge points lie on frame edges)"""
+    out_h = distance_map.shape[0] - template['h'] + 1
+    out_w = distance_map.shape[1] - template['w'] + 1
+    total = np.zeros((out_h, out_w), dtype=np.float32)
+    for py, px in template['points']:
+        total += distance_map[py:py+out_h, px:px+out_w]
+    return 1.0 - total / (len(template['points']) * CHAMFER_TRUNCATE)
+
+def kill_color_mask(image):
+    """Mask (0/255) of kill-color pixels, both red hue ranges"""
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    mask1 = cv2.inRange(hsv, KILL_COLOR_LOWER, KILL_COLOR_UPPER)
+    mask2 = cv2.inRange(hsv, KILL_COLOR_LOWER2, KILL_COLOR_UPPER2)
+    return cv2.bitwise_or(mask1, mask2)
+
+def count_red_pixels(image, scale, report):
+    """Kill-color pixels in the image, counted on a downsampled copy and rescaled to full size"""
+    with report.stage('colorGate'):
+        # Area averaging keeps thin red borders reddish instead of skipping them
+        small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        count = cv2.countNonZero(kill_color_mask(small))
+    return count / (scale * scale)
+
+def red_pixel_integral(image, report):
+    """Integral image of the kill-color mask: any rectangle's red count in O(1)"""
+    with report.stage('colorMask'):
+        return cv2.integral(cv2.bitwise_and(kill_color_mask(image), 1), sdepth=cv2.CV_32S)
+
+def rect_pixel_count(integral, x, y, w, h, border=0):
+    """Mask pixels inside a rectangle, or only in its border strip of the given width"""
+    total = int(integral[y+h, x+w] - integral[y, x+w] - integral[y+h, x] + integral[y, x])
+    if border <= 0 or 2 * border >= min(w, h):
+        return total
+    x, y, w, h = x + border, y + border, w - 2 * border, h - 2 * border
+    return total - int(integral[y+h, x+w] - integral[y, x+w] - integral[y+h, x] + integral[y, x])
+
+class FrameMatcher:
+    """Finds killfeed rows in sampled ROIs; a batch of ROIs shares one stacked preprocessing/matching pass"""
+    
+    def __init__(self, templates, canny_detector, use_chamfer, match_threshold, min_color_pixels,
+                 color_gate_pixels, color_border, roi_origin, report):
+        self.templates = templates
+        self.canny_detector = canny_detector
+        self.use_chamfer = use_chamfer
+        self.match_threshold = match_threshold
+        self.min_color_pixels = min_color_pixels
+        self.color_gate_pixels = color_gate_pixels
+        self.color_border = color_border
+        self.roi_x, self.roi_y = roi_origin
+        self.report = report
+    
+    def stack(self, images):
+        """Stack equally sized images vertically with edge-replicated padding; returns (stack, row step)"""
+        if len(images) == 1:
+            return images[0], images[0].shape[0]
+        height = images[0].shape[0]
+        half = BATCH_PADDING // 2
+        step = height + BATCH_PADDING
+        stacked = np.empty((step * len(images) - BATCH_PADDING,) + images[0].shape[1:], dtype=images[0].dtype)
+        for i, image in enumerate(images):
+            top = i * step
+            stacked[top:top+height] = image
+            if i > 0:
+                # Replicated borders keep Canny's gradients at the ROI edges as for a single ROI
+                stacked[top-half:top] = image[:1]
+                stacked[top-BATCH_PADDING:top-half] = images[i-1][-1:]
+        return stacked, step
+    
+    def edges(self, gray):
+        """Canny edge map (GPU when available)"""
+        with self.report.stage('canny'):
+            if self.canny_detector is not None:
+                try:
+                    # GPU Canny
+                    gpu_frame_gray = cv2.cuda_GpuMat()
+                    gpu_frame_gray.upload(gray)
+                    return self.canny_detector.detect(gpu_frame_gray).download()
+                except:
+                    # CPU fallback
+                    pass
+            return cv2.Canny(gray, CANNY_THRESHOLD1, CANNY_THRESHOLD2)
+    
+    def detect(self, batch):
+        """Rows for each (frame_count, frame, search_frame, gated) entry; None for gated frames"""
+        report = self.report
+        to_match = []
+        for _, frame, search_frame, gated in batch:
+            if gated:
+                to_match.append(None)
+                continue
+            
+            red_integral = None
+            # Color gate: without red border pixels anywhere in the ROI there is nothing to match
+            if self.color_gate_pixels and COLOR_GATE_SCALE >= 1.0:
+                # Full-resolution gate: the same mask serves the candidate checks
+                red_integral = red_pixel_integral(search_frame, report)
+                red_total = int(red_integral[-1, -1])
+            elif self.color_gate_pixels:
+                red_total = count_red_pixels(search_frame, COLOR_GATE_SCALE, report)
+            
+            if self.color_gate_pixels and red_total < self.color_gate_pixels:
+                report.count('frames_rejected_color_gate')
+                to_match.append(())
+            else:
+                report.count('frames_matched')
+                to_match.append((frame, search_frame, red_integral))
+        
+        matched_rows = iter(self.match([item for item in to_match if item]))
+        return [None if item is None else next(matched_rows) if item else [] for item in to_match]
+    
+    def match(self, items):
+        """Rows for each (frame, search_frame, red_integral) item, in order"""
+        if not items:
+            return []
+        report = self.report
+        search_frames = [search_frame for _, search_frame, _ in items]
+        height = search_frames[0].shape[0]
+        stacked, step = self.stack(search_frames)
+        
+        # Shared preprocessing: grayscale + Canny once per batch
+        if USE_EDGE_DETECTION:
+            with report.stage('cvtColor'):
+                frame_gray = cv2.cvtColor(stacked, cv2.COLOR_BGR2GRAY)
+            search_image = self.edges(frame_gray)
+            if len(items) > 1:
+                # Padding rows carry no edges, so nothing leaks between frames
+                for i in range(1, len(items)):
+                    search_image[i*step-BATCH_PADDING:i*step] = 0
+        else:
+            search_image = stacked
+        
+        # Template matching against every template in the library
+        if self.use_chamfer:
+            with report.stage('distanceTransform'):
+                distance_map = chamfer_distance_map(search_image)
+            with report.stage('chamfer'):
+                results = [chamfer_scores(distance_map, tp) for tp in self.templates]
+        else:
+            with report.stage('matchTemplate'):
+                results = [cv2.matchTemplate(search_image, tp['edges'] if USE_EDGE_DETECTION else tp['image'],
+                                             cv2.TM_CCOEFF_NORMED)
+                           for tp in self.templates]
+        
+        # One threshold pass per template, candidates split back to their frames
+        with report.stage('threshold'):
+            candidates = [[] for _ in items]
+            scores = [[] for _ in items]
+            for template_index, res in enumerate(results):
+                ys, xs = np.where(res >= self.match_threshold)
+                if len(ys) == 0:
+                    continue
+                frame_index, local_y = np.divmod(ys, step)
+                # Placements that reach into the padding belong to no frame
+                valid = local_y <= height - self.templates[template_index]['h']
+                values = res[ys, xs]
+                for i in np.unique(frame_index[valid]):
+                    sel = valid & (frame_index == i)
+                    candidates[i].extend((pt, template_index) for pt in zip(xs[sel], local_y[sel]))
+                    scores[i].append(values[sel])
+        
+        return [self.select_rows(item, frame_candidates, frame_scores)
+                for item, frame_candidates, frame_scores in zip(items, candidates, scores)]
+    
+    def select_rows(self, item, candidates, scores):
+        """Color-verify candidates of one frame and pick its killfeed rows"""
+        frame, search_frame, red_integral = item
+        report = self.report
+        templates = self.templates
+        rows = []
+        if not candidates:
+            return rows
+        
+        report.count('frames_with_candidates')
+        if USE_KILL_TRACKER:
+            # Best match per killfeed row: strongest candidates first, one per row. Scores of a
+            # batched matchTemplate differ from a single frame's in the last bits, so ties go to
+            # the topmost, then leftmost candidate and the rows do not depend on the batch size
+            xs = np.array([pt[0] for pt, _ in candidates])
+            ys = np.array([pt[1] for pt, _ in candidates])
+            order = np.lexsort((xs, ys, -np.round(np.concatenate(scores), SCORE_DECIMALS)))
+            candidates = [candidates[i] for i in order]
+            checked_rows = []
+        
+        # Killfeed found - now check red border
+        for pt, template_index in candidates:
+            if USE_KILL_TRACKER and any(abs(pt[1] - row_y) < radius for row_y, radius in checked_rows):
+                continue
+            
+            report.count('candidates_tested')
+            template_h = templates[template_index]['h']
+            template_w = templates[template_index]['w']
+            # Adjust coordinates if using ROI
+            x, y = int(pt[0]) + self.roi_x, int(pt[1]) + self.roi_y
+            
+            # Color filter - red pixels of the candidate rectangle (or its border strip)
+            if USE_COLOR_FILTER:
+                if red_integral is None:
+                    # One HSV mask per ROI, shared by all candidates
+                    red_integral = red_pixel_integral(search_frame, report)
+                with report.stage('colorFilter'):
+                    color_pixel_count = rect_pixel_count(red_integral, pt[0], pt[1],
+                                                         template_w, template_h, self.color_border)
+                
+                # Skip if not enough red pixels (enemy kill - gray border)
+                if color_pixel_count < self.min_color_pixels:
+                    report.count('candidates_rejected_color')
+                    if USE_KILL_TRACKER:
+                        # Rejected candidates suppress neighbors within half a template height
+                        checked_rows.append((pt[1], max(1, template_h // 2)))
+                    continue
+            else:
+                color_pixel_count = None
+            
+            if len(templates) > 1:
+                report.count(f"template:{templates[template_index]['name']}")
+            
+            if not USE_KILL_TRACKER:
+                rows.append((x, y, color_pixel_count, None, template_index))
+                break  # Got first match, continue
+            
+            # Entries never overlap, so nothing within a template height is another row
+            checked_rows.append((pt[1], template_h))
+            signature = killfeed_signature(search_frame[pt[1]:pt[1]+template_h, pt[0]:pt[0]+template_w])
+            rows.append((x, y, color_pixel_count, signature, template_index))
+        return rows
 
-def detect_kills_in_video(video_path, template_path):
-    """Detect killfeeds in video"""
+def detect_kills_in_video(video_path, template_path, report=None, batch_report=None, cancelled=None):
+    """Detect killfeeds in video (batch_report: BatchReport for the batch ETA,
+    cancelled: callable checked at every progress update, the scan stops with no kills once it returns True)"""
+    if report is None:
+        report = PerfReport(os.path.basename(video_path))
+    
     log_message(f"\n{'='*60}", "info")
     log_message(f"{t('log_analyzing_video')}: {os.path.basename(video_path)}", "info")
     log_message(f"{'='*60}", "info")
     
     cap = cv2.VideoCapture(video_path)
-    template = cv2.imread(template_path)
     
-    if template is None:
-        log_message(f"{t('log_template_error')}: {template_path}", "error")
-        return [], 0
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    
+    # Timestamp index: true presentation times instead of frame_count / fps (VFR recordings drift)
+    frame_times = None
+    if USE_PTS_INDEX:
+        pts_index = load_pts_index(video_path)
+        if pts_index is None:
+            log_message(t('log_pts_index_unavailable'), "warning")
+        else:
+            frame_times = pts_index[0]
+            total_frames = len(frame_times)
+            duration = index_duration(frame_times)
+            variable = len(frame_times) > 1 and np.ptp(np.diff(frame_times)) > VFR_TOLERANCE
+            log_message(t('log_pts_index', frames=total_frames, keyframes=len(pts_index[1]),
+                          mode='VFR' if variable else 'CFR'), "info")
+    if not fps > 0 and frame_times is not None and len(frame_times) > 1 and frame_times[-1] > frame_times[0]:
+        # No frame rate in the header (unreadable or remuxed without one): the mean rate of the index
+        fps = (len(frame_times) - 1) / float(frame_times[-1] - frame_times[0])
+    if not fps > 0:
+        cap.release()
+        log_message(t('log_fps_unknown'), "error")
+        return [], 0.0
+    if frame_times is None:
+        duration = total_frames / fps
+    frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    
+    # Templates follow the HUD size of this resolution
+    template_scale = get_template_scale(video_path, template_path, frame_width, frame_height)
+    if template_scale != 1.0:
+        log_message(t('log_template_scale', scale=template_scale, w=frame_width, h=frame_height), "info")
+    
+    # Downscaled frames (full-size decode, scaled in FFmpeg): ROI and templates are scaled down with them
+    decode_scale = get_decode_scale()
+    if decode_scale < 1.0:
+        cap.release()
+        cap = None
+        frame_width, frame_height = scaled_frame_size(frame_width, frame_height, decode_scale)
+        log_message(t('log_decode_scale', scale=decode_scale, w=frame_width, h=frame_height), "info")
     
-    template_h, template_w = template.shape[:2]
+    # MIN_COLOR_PIXELS is given for the template at its native size
+    pixel_scale = decode_scale * template_scale
+    min_color_pixels = MIN_COLOR_PIXELS
+    if pixel_scale != 1.0:
+        min_color_pixels = max(1, int(MIN_COLOR_PIXELS * pixel_scale * pixel_scale))
     
     # Check GPU availability
     global use_gpu
@@ -262,45 +1668,67 @@ def detect_kills_in_video(video_path, template_path):
         log_message(t('log_gpu_disabled'), "info")
     
     # Prepare for edge detection
+    canny_detector = None
     if USE_EDGE_DETECTION:
-        template_gray = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
-        
         if use_gpu:
-            # GPU: Upload template to GPU and apply Canny
             try:
-                gpu_template_gray = cv2.cuda_GpuMat()
-                gpu_template_gray.upload(template_gray)
                 canny_detector = cv2.cuda.createCannyEdgeDetector(CANNY_THRESHOLD1, CANNY_THRESHOLD2)
-                gpu_template_edges = canny_detector.detect(gpu_template_gray)
-                template_edges = gpu_template_edges.download()
             except:
                 # Fallback to CPU
-                template_edges = cv2.Canny(template_gray, CANNY_THRESHOLD1, CANNY_THRESHOLD2)
-        else:
-            template_edges = cv2.Canny(template_gray, CANNY_THRESHOLD1, CANNY_THRESHOLD2)
-        
+                canny_detector = None
         log_message(t('log_detection_edge', t1=CANNY_THRESHOLD1, t2=CANNY_THRESHOLD2), "info")
     else:
         log_message(t('log_detection_normal'), "info")
     
+    # Template library: preprocessed once, every sampled ROI is matched against all of them
+    templates = load_templates(template_path, round(pixel_scale, 4), canny_detector)
+    
     if USE_COLOR_FILTER:
         log_message(t('log_color_filter'), "info")
     
     if USE_ROI:
         log_message(t('log_roi_enabled'), "info")
     
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    duration = total_frames / fps
-    frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    
     # Calculate ROI coordinates
     if USE_ROI:
         roi_x1 = int(frame_width * ROI_X_START)
         roi_y1 = int(frame_height * ROI_Y_START)
         roi_x2 = int(frame_width * ROI_X_END)
         roi_y2 = int(frame_height * ROI_Y_END)
+        search_w, search_h = roi_x2 - roi_x1, roi_y2 - roi_y1
+    else:
+        search_w, search_h = frame_width, frame_height
+    
+    # matchTemplate needs the template to fit inside the search region
+    fitting = [tp for tp in templates if tp['w'] <= search_w and tp['h'] <= search_h]
+    for tp in templates:
+        if tp not in fitting:
+            log_message(t('log_template_too_large', name=tp['name'], tw=tp['w'], th=tp['h'], w=search_w, h=search_h), "warning")
+    templates = fitting
+    
+    # An edge map without edges scores 1.0 everywhere
+    if USE_EDGE_DETECTION:
+        for tp in templates:
+            if not cv2.countNonZero(tp['edges']):
+                log_message(t('log_template_no_edges', name=tp['name'], tw=tp['w'], th=tp['h']), "warning")
+        templates = [tp for tp in templates if cv2.countNonZero(tp['edges'])]
+    
+    if not templates:
+        log_message(f"{t('log_template_error')}: {template_path}", "error")
+        if cap is not None:
+            cap.release()
+        return [], 0
+    
+    # Matcher backend: chamfer scores placements on the distance transform of the ROI edges
+    use_chamfer = MATCHER == 'chamfer' and USE_EDGE_DETECTION
+    if MATCHER == 'chamfer' and not USE_EDGE_DETECTION:
+        log_message(t('log_chamfer_needs_edges'), "warning")
+    elif use_chamfer:
+        log_message(t('log_matcher_chamfer', points=CHAMFER_POINTS), "info")
+    match_threshold = CHAMFER_THRESHOLD if use_chamfer else THRESHOLD
+    
+    if len(templates) > 1:
+        log_message(t('log_templates_loaded', count=len(templates), names=', '.join(tp['name'] for tp in templates)), "info")
     
     log_message(t('log_video_info'), "info")
     log_message(f"{t('log_fps')}: {fps:.2f}", "info")
@@ -310,90 +1738,150 @@ def detect_kills_in_video(video_path, template_path):
     if USE_ROI:
         log_message(f"{t('log_roi_region')}: [{roi_x1},{roi_y1}] -> [{roi_x2},{roi_y2}]", "info")
     log_message(t('log_scan_speed', skip=FRAME_SKIP), "info")
-    log_message(f"{t('log_threshold')}: {THRESHOLD}", "info")
+    log_message(f"{t('log_threshold')}: {match_threshold}", "info")
     log_message(f"\n{t('log_scan_starting')}", "info")
     
+    report.settings.update({
+        'FRAME_SKIP': FRAME_SKIP,
+        'THRESHOLD': match_threshold,
+        'MATCHER': 'chamfer' if use_chamfer else 'ccoeff',
+        'resolution': f"{frame_width}x{frame_height}",
+        'DECODE_SCALE': decode_scale,
+        'template_scale': template_scale,
+        'roi': [roi_x1, roi_y1, roi_x2, roi_y2] if USE_ROI else None,
+        'templates': [tp['name'] for tp in templates],
+        'fps': fps,
+        'duration': duration,
+    })
+    
+    # Cheapest stage first: a frame without enough red pixels cannot hold a player kill
+    color_gate_pixels = min_color_pixels if USE_COLOR_GATE and USE_COLOR_FILTER else 0
+    color_border = max(1, round(COLOR_FILTER_BORDER * pixel_scale)) if COLOR_FILTER_BORDER > 0 else 0
+    
     kill_times = []
-    frame_count = 0
     last_kill_print_time = -999
+    gate_rows = []
     
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        frame_count += 1
-        current_time = frame_count / fps
-        
-        # FRAME_SKIP kadar frame atla
-        if frame_count % FRAME_SKIP != 0:
-            continue
-        
-        # Show progress
-        if frame_count % (50 * FRAME_SKIP) == 0:
-            update_progress(frame_count, total_frames, f"Tarama: {current_time:.1f}s / {duration:.1f}s")
-        
-        # Use ROI (only check killfeed region)
-        if USE_ROI:
-            search_frame = frame[roi_y1:roi_y2, roi_x1:roi_x2]
-        else:
-            search_frame = frame
-        
-        # Template matching
-        if USE_EDGE_DETECTION:
-            frame_gray = cv2.cvtColor(search_frame, cv2.COLOR_BGR2GRAY)
-            
-            if use_gpu:
-                try:
-                    # GPU: Canny + Template Matching
-                    gpu_frame_gray = cv2.cuda_GpuMat()
-                    gpu_frame_gray.upload(frame_gray)
-                    gpu_frame_edges = canny_detector.detect(gpu_frame_gray)
-                    frame_edges = gpu_frame_edges.download()
-                    res = cv2.matchTemplate(frame_edges, template_edges, cv2.TM_CCOEFF_NORMED)
-                except:
-                    # CPU fallback
-                    frame_edges = cv2.Canny(frame_gray, CANNY_THRESHOLD1, CANNY_THRESHOLD2)
-                    res = cv2.matchTemplate(frame_edges, template_edges, cv2.TM_CCOEFF_NORMED)
-            else:
-                frame_edges = cv2.Canny(frame_gray, CANNY_THRESHOLD1, CANNY_THRESHOLD2)
-                res = cv2.matchTemplate(frame_edges, template_edges, cv2.TM_CCOEFF_NORMED)
+    sample_interval = FRAME_SKIP / fps
+    if USE_KILL_TRACKER:
+        row_height = max(tp['h'] for tp in templates)
+        tracker = KillfeedTracker(KILLFEED_ENTRY_LIFETIME, sample_interval, row_height)
+        if sample_interval > KILLFEED_ENTRY_LIFETIME:
+            log_message(t('log_skip_exceeds_lifetime', interval=sample_interval, lifetime=KILLFEED_ENTRY_LIFETIME), "warning")
+    
+    # Audio pre-pass: only scan short windows around kill-sound candidates
+    windows = None
+    if USE_AUDIO_PREPASS and not AUDIO_REFERENCE_PATH:
+        # No kill sound ships with the app, each game needs its own recording
+        log_message(t('log_audio_no_reference'), "warning")
+    elif USE_AUDIO_PREPASS:
+        candidates = find_audio_candidates(video_path, AUDIO_REFERENCE_PATH, report)
+        if candidates is None:
+            log_message(t('log_audio_full_scan'), "warning")
         else:
-            res = cv2.matchTemplate(search_frame, template, cv2.TM_CCOEFF_NORMED)
-        
-        loc = np.where(res >= THRESHOLD)
-        
-        if len(loc[0]) > 0:
-            # Killfeed found - now check red border
-            for pt in zip(*loc[::-1]):
-                # Adjust coordinates if using ROI
-                if USE_ROI:
-                    x, y = pt[0] + roi_x1, pt[1] + roi_y1
-                else:
-                    x, y = pt[0], pt[1]
+            windows = audio_scan_windows(candidates, fps, total_frames, frame_times)
+            scanned_fraction = sum(end - start for start, end in windows) / max(1, total_frames)
+            report.settings['scanned_fraction'] = round(scanned_fraction, 4)
+            log_message(t('log_audio_candidates', count=len(candidates), windows=len(windows),
+                          percent=scanned_fraction * 100), "info")
+    
+    # ROI cache: a finished scan of this video, ROI and sampling replays from disk without decoding
+    roi = (roi_x1, roi_y1, roi_x2, roi_y2) if USE_ROI else (0, 0, frame_width, frame_height)
+    cached = None
+    if USE_ROI_CACHE:
+        cache_array_path, cache_sidecar_path = roi_cache_paths(video_path, roi, (frame_width, frame_height))
+        cached = load_roi_cache(cache_array_path, cache_sidecar_path)
+    
+    if cached is not None:
+        crops, frame_indexes = cached
+        log_message(t('log_roi_cache_hit', frames=len(frame_indexes)), "info")
+        report.settings['roi_cache'] = 'hit'
+        frames = iter_roi_cache(crops, frame_indexes, report, windows)
+    elif decode_scale < 1.0:
+        frames = iter_sampled_frames_ffmpeg(video_path, frame_width, frame_height, report, fps, windows, frame_times)
+    else:
+        frames = iter_sampled_frames(cap, report, windows)
+    
+    # Only a full scan fills the cache, audio windows would leave gaps
+    if USE_ROI_CACHE and cached is None and windows is None:
+        log_message(t('log_roi_cache_writing'), "info")
+        report.settings['roi_cache'] = 'write'
+        frames = iter_roi_cache_writer(frames, roi, cache_array_path, cache_sidecar_path,
+                                       total_frames // FRAME_SKIP + ROI_CACHE_SPARE_FRAMES, fps, report, frame_times)
+    # Full frames only travel with the ROIs when someone looks at the preview
+    keep_frames = preview_enabled() and USE_ROI and cached is None
+    
+    matcher = FrameMatcher(templates, canny_detector, use_chamfer, match_threshold, min_color_pixels,
+                           color_gate_pixels, color_border, (roi_x1, roi_y1) if USE_ROI else (0, 0), report)
+    # Stacking pays off for matchTemplate; chamfer scoring would only scan the padding too
+    batch_size = 1 if use_chamfer else max(1, DETECT_BATCH_SIZE)
+    # The CUDA Canny detector is not shared between threads
+    workers = 1 if canny_detector is not None else get_detect_workers()
+    report.settings['DETECT_WORKERS'] = workers
+    
+    # Decoder thread: decode, crop and change-gate ahead of the detector threads
+    batches = iter_batches(iter_roi_frames(frames, roi if USE_ROI and cached is None else None, report, keep_frames),
+                           batch_size)
+    if workers > 1:
+        log_message(t('log_detect_workers', workers=workers), "info")
+        # Bounded by bytes: buffered ROIs, not batches, are what costs memory at high resolutions
+        preview_width = min(frame_width, PREVIEW_MAX_WIDTH)
+        preview_bytes = preview_width * frame_height * preview_width // frame_width * 3 if keep_frames else 0
+        entry_bytes = (roi[2] - roi[0]) * (roi[3] - roi[1]) * 3 + preview_bytes
+        queue_batches = detect_queue_batches(entry_bytes, batch_size)
+        report.settings['detect_queue_batches'] = queue_batches
+        batches = iter_in_thread(batches, queue_batches)
+    detected = iter_detected_batches(batches, matcher, workers)
+    meter = ThroughputMeter()
+    meter.add(0, 0.0)
+    # The meter sees decoded frames and the media they cover, not the gaps between audio windows
+    scanned_frames, scanned_seconds = 0, 0.0
+    last_count, last_time = 0, 0.0
+    abandoned = False
+    
+    try:
+        for batch, batch_rows in detected:
+            if abandoned:
+                break
+            for (frame_count, frame, search_frame, _), rows in zip(batch, batch_rows):
+                current_time = frame_time(frame_count, fps, frame_times)
+                report.count('frames_analyzed')
                 
-                # Get killfeed region
-                roi = frame[y:y+template_h, x:x+template_w]
+                # Show progress; a jump to the next audio window covers one sample interval, not the gap
+                step = frame_count - last_count
+                if step > 0:
+                    scanned_frames += min(step, FRAME_SKIP)
+                    scanned_seconds += (current_time - last_time) * min(step, FRAME_SKIP) / step
+                last_count, last_time = frame_count, current_time
+                if meter.add(scanned_frames, scanned_seconds):
+                    remaining = None
+                    if windows is not None:
+                        remaining = sum(end - max(start, frame_count)
+                                        for start, end in windows if end > frame_count) / fps
+                    report_scan_progress(meter, report.video_name, frame_count, total_frames,
+                                         current_time, duration, batch_report, remaining)
+                    if cancelled is not None and cancelled():
+                        abandoned = True
+                        break
                 
-                # Color filter - check border only (edges)
-                if USE_COLOR_FILTER:
-                    # Convert BGR to HSV
-                    hsv_roi = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
-                    
-                    # Find red pixels (two ranges)
-                    mask1 = cv2.inRange(hsv_roi, KILL_COLOR_LOWER, KILL_COLOR_UPPER)
-                    mask2 = cv2.inRange(hsv_roi, KILL_COLOR_LOWER2, KILL_COLOR_UPPER2)
-                    mask = cv2.bitwise_or(mask1, mask2)
-                    
-                    color_pixel_count = cv2.countNonZero(mask)
-                    
-                    # Skip if not enough red pixels (enemy kill - gray border)
-                    if color_pixel_count < MIN_COLOR_PIXELS:
-                        continue
+                if rows is None:
+                    # Change gate: reuse the verdict of the last fully analyzed frame
+                    rows = gate_rows
+                else:
+                    gate_rows = rows
+                
+                if USE_KILL_TRACKER:
+                    # One event per killfeed row that was not on screen before
+                    new_rows = tracker.update(rows, current_time)
+                elif rows and (not kill_times or (current_time - kill_times[-1]) > 0.5):
+                    new_rows = rows
+                else:
+                    new_rows = []
                 
                 # Valid kill
-                if not kill_times or (current_time - kill_times[-1]) > 0.5:
+                for x, y, color_pixel_count, _, template_index in new_rows:
                     kill_times.append(current_time)
+                    emit_event('kill', video=os.path.basename(video_path), time=round(current_time, 3))
                     
                     if current_time - last_kill_print_time > KILL_COOLDOWN:
                         color_info = f" (🔴 {color_pixel_count} red pixels)" if USE_COLOR_FILTER else ""
@@ -401,15 +1889,33 @@ def detect_kills_in_video(video_path, template_path):
                         last_kill_print_time = current_time
                         
                         # Show preview - draw ROI rectangle
-                        preview_frame = frame.copy()
-                        if USE_ROI:
-                            cv2.rectangle(preview_frame, (roi_x1, roi_y1), (roi_x2, roi_y2), (0, 255, 255), 2)
-                        cv2.rectangle(preview_frame, (x, y), (x+template_w, y+template_h), (0, 0, 255), 3)
-                        show_preview(preview_frame)
-                
-                break  # Got first match, continue
+                        with report.stage('preview'):
+                            template_h = templates[template_index]['h']
+                            template_w = templates[template_index]['w']
+                            if frame is not None:
+                                # Preview-sized copy of the frame
+                                s = frame.shape[1] / frame_width
+                                preview_frame = frame.copy()
+                                cv2.rectangle(preview_frame, (int(roi_x1 * s), int(roi_y1 * s)),
+                                              (int(roi_x2 * s), int(roi_y2 * s)), (0, 255, 255), 2)
+                            else:
+                                # Only the ROI was kept (cached scan, no ROI or no preview shown)
+                                s = 1.0
+                                preview_frame = search_frame.copy()
+                                x, y = x - roi[0], y - roi[1]
+                            cv2.rectangle(preview_frame, (int(x * s), int(y * s)),
+                                          (int((x + template_w) * s), int((y + template_h) * s)), (0, 0, 255), 3)
+                            show_preview(preview_frame)
+    finally:
+        detected.close()
+        batches.close()
     
-    cap.release()
+    if cap is not None:
+        cap.release()
+    if abandoned:
+        # A partial scan must not pass for the video's kills
+        return [], fps
+    report.count('kills', len(kill_times))
     log_message(f"\n{t('log_total_kills', count=len(kill_times))}", "success")
     return kill_times, fps
 
@@ -437,88 +1943,395 @@ def merge_close_kills(kill_times, min_gap):
     
     return merged
 
-def extract_clips(video_path, kill_segments, fps, video_name):
-    """Extract kill clips with FFmpeg"""
-    log_message(f"\n{t('log_extracting_clips', count=len(kill_segments))}", "info")
+def union_intervals(intervals, tolerance=0.0):
+    """Merge overlapping or touching (start, end) intervals, including gaps of up to tolerance seconds"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + tolerance:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def pad_interval(start, end, min_length, duration):
+    """Grow an interval evenly on both sides to min_length, shifting into the video at its edges"""
+    missing = min_length - (end - start)
+    if missing <= 0:
+        return start, end
+    start, end = start - missing / 2, end + missing / 2
+    if start < 0:
+        start, end = 0.0, end - start
+    if end > duration:
+        start, end = max(0.0, start - (end - duration)), duration
+    return start, end
+
+def split_interval(start, end, kill_times, max_length):
+    """Split an interval into pieces of at most max_length, cutting halfway between kills where possible"""
+    quiet_points = [(a + b) / 2 for a, b in zip(kill_times, kill_times[1:])]
+    pieces = []
+    while end - start > max_length:
+        # Even pieces for what is left, each cut snapped to the nearest quiet point
+        target = (end - start) / math.ceil((end - start) / max_length)
+        ideal = start + target
+        candidates = [p for p in quiet_points if ideal - target / 4 <= p <= min(ideal + target / 4, start + max_length)]
+        cut = min(candidates, key=lambda p: abs(p - ideal)) if candidates else ideal
+        pieces.append((start, cut))
+        start = cut
+    pieces.append((start, end))
+    return pieces
+
+def stream_copy_keyframes(video_path):
+    """Keyframe times stream-copied clips start at, None if clips are re-encoded, virtual or unindexed"""
+    if CLIP_OUTPUT_MODE != 'copy' or not USE_PTS_INDEX:
+        return None
+    pts_index = load_pts_index(video_path)
+    if pts_index is None or not len(pts_index[1]):
+        return None
+    return pts_index[1]
+
+def keyframe_before(time, keyframes):
+    """Last keyframe at or before time (time itself without keyframes or before the first one)"""
+    if keyframes is None:
+        return time
+    k = int(np.searchsorted(keyframes, time + KEYFRAME_SEEK_EPSILON, side='right')) - 1
+    return float(keyframes[k]) if k >= 0 else time
+
+def keyframe_cuts(pieces, keyframes):
+    """Move the inner cuts of a split interval back to keyframes (pieces may then exceed the limit by a GOP)"""
+    start, end = pieces[0][0], pieces[-1][1]
+    cuts = sorted({keyframe_before(piece_start, keyframes) for piece_start, _ in pieces[1:]})
+    bounds = [start] + [cut for cut in cuts if cut > start] + [end]
+    return list(zip(bounds, bounds[1:]))
+
+def plan_clip_intervals(kill_times, duration, video_size=0, report=None, fps=0.0, keyframes=None):
+    """Clip (start, end) ranges: buffered kill groups unioned, clamped to the video and kept within the length limits.
+    keyframes: stream copy starts every clip at the keyframe before it, the ranges are planned with those starts"""
+    # Clips less than a frame apart only differ by float rounding: one cut there would drop or repeat a frame
+    tolerance = CLIP_JOIN_FRAMES / (fps if fps > 0 else DEFAULT_FPS)
+    segments = merge_close_kills(kill_times, MIN_KILL_GAP)
+    # What extracting every buffered segment on its own would cost
+    naive_seconds = sum(end + BUFFER_AFTER - keyframe_before(max(0, start - BUFFER_BEFORE), keyframes)
+                        for start, end in segments)
+    
+    # Unknown length: nothing to clamp to
+    video_end = duration if duration > 0 else math.inf
+    # Starts are snapped before the union, otherwise a snapped start reaches back into the previous clip
+    clips = union_intervals(((keyframe_before(max(0.0, start - BUFFER_BEFORE), keyframes),
+                              min(video_end, end + BUFFER_AFTER)) for start, end in segments), tolerance)
+    if MIN_CLIP_LENGTH > 0:
+        # Padding can make neighbors overlap again
+        padded = (pad_interval(start, end, MIN_CLIP_LENGTH, video_end) for start, end in clips)
+        clips = union_intervals(((keyframe_before(start, keyframes), end) for start, end in padded), tolerance)
+    if MAX_CLIP_LENGTH > 0:
+        split = [split_interval(start, end, [k for k in kill_times if start <= k <= end], MAX_CLIP_LENGTH)
+                 for start, end in clips]
+        if keyframes is not None:
+            split = [keyframe_cuts(pieces, keyframes) for pieces in split]
+        clips = [piece for pieces in split for piece in pieces]
+    
+    saved_seconds = naive_seconds - sum(end - start for start, end in clips)
+    saved_bytes = int(video_size * saved_seconds / duration) if duration > 0 else 0
+    if report is not None:
+        report.settings.update({'clip_seconds_saved': round(saved_seconds, 3), 'clip_bytes_saved': saved_bytes})
+    if saved_seconds > 0.05:
+        log_message(t('log_clip_plan_saved', clips=len(clips), seconds=saved_seconds,
+                      mb=saved_bytes / (1024 * 1024)), "info")
+    return clips
+
+def video_duration(video_path):
+    """Video length in seconds, from the PTS index when available (0.0 if unknown)"""
+    pts_index = load_pts_index(video_path) if USE_PTS_INDEX else None
+    if pts_index is not None:
+        return index_duration(pts_index[0])
+    return container_duration(video_path)
+
+def container_duration(video_path):
+    """Video length in seconds from the container's frame count and rate (0.0 if unknown).
+    Probed once per file: batch ordering and the batch ETA ask for the same videos"""
+    try:
+        stat = os.stat(video_path)
+    except OSError:
+        return 0.0
+    key = (os.path.abspath(video_path), stat.st_size, stat.st_mtime)
+    if key not in _duration_cache:
+        cap = cv2.VideoCapture(video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        cap.release()
+        _duration_cache[key] = frames / fps if fps else 0.0
+    return _duration_cache[key]
+
+def plan_encode_jobs(clip_count):
+    """Encoder scheduling for re-encoded clips, returns (jobs in flight, ffmpeg -threads per job)"""
+    # One core stays free for the GUI and the scanner
+    usable = max(1, (os.cpu_count() or 1) - 1)
+    jobs = ENCODE_JOBS if ENCODE_JOBS > 0 else max(1, usable // ENCODE_THREADS_PER_JOB)
+    jobs = max(1, min(jobs, clip_count))
+    threads = ENCODE_THREADS if ENCODE_THREADS > 0 else max(1, usable // jobs)
+    return jobs, threads
+
+def audio_stream_count(video_path):
+    """Number of audio streams in the video (1 if FFmpeg cannot be run)"""
+    # Without an output FFmpeg only prints the input's streams and exits with an error
+    try:
+        result = subprocess.run(['ffmpeg', '-hide_banner', '-i', video_path], capture_output=True, text=True)
+    except OSError:
+        return 1
+    return sum(1 for line in result.stderr.splitlines()
+               if line.lstrip().startswith('Stream #') and ': Audio:' in line)
+
+def reencode_args(duration, threads, audio_streams=1):
+    """FFmpeg output options of the re-encode profile for a clip of the given length
+    audio_streams: audio tracks of the source, every one is re-encoded at ENCODE_AUDIO_BITRATE"""
+    # Streams without an explicit codec below (subtitles, data) are still copied
+    args = ['-c', 'copy',
+            '-c:v', REENCODE_CODEC, '-preset', REENCODE_PRESET, '-crf', str(REENCODE_CRF),
+            '-c:a', 'aac', '-b:a', f"{ENCODE_AUDIO_BITRATE}k",
+            '-threads', str(threads)]
+    
+    # Size limit: cap the video bitrate so that video + all audio tracks fit the budget
+    max_bitrate = REENCODE_MAX_BITRATE
+    if REENCODE_MAX_SIZE_MB > 0 and duration > 0:
+        budget = (REENCODE_MAX_SIZE_MB * 8 * 1024 * ENCODE_SIZE_HEADROOM / duration
+                  - ENCODE_AUDIO_BITRATE * audio_streams)
+        budget = max(1, int(budget))
+        max_bitrate = min(max_bitrate, budget) if max_bitrate > 0 else budget
+    if max_bitrate > 0:
+        # Capped CRF: quality-driven below the cap, VBV-limited above it
+        args += ['-maxrate', f"{max_bitrate}k", '-bufsize', f"{2 * max_bitrate}k"]
+    if REENCODE_CODEC in ('libx264', 'libx265'):
+        args += ['-pix_fmt', 'yuv420p']
+    args += ['-movflags', '+faststart']
+    return args
+
+def run_clip_command(cmd, report, low_priority=False):
+    """Run one FFmpeg clip command, returns (returncode, stderr)
+    low_priority: start it below normal priority (BELOW_NORMAL class on Windows, ENCODE_NICENESS elsewhere)"""
+    kwargs = {}
+    if low_priority and os.name == 'nt':
+        kwargs['creationflags'] = subprocess.BELOW_NORMAL_PRIORITY_CLASS
+    elif low_priority and hasattr(os, 'nice'):
+        # Set in the child before exec; os.nice takes no locks, safe to fork from the encoder threads
+        kwargs['preexec_fn'] = lambda: os.nice(ENCODE_NICENESS)
+    with report.stage('extract'):
+        process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, **kwargs)
+        _, stderr = process.communicate()
+    return process.returncode, stderr
+
+def write_virtual_clips(video_path, clip_ranges, kill_times, fps, video_name, report):
+    """Write the planned clips as timelines referencing the source video (no video bytes)"""
+    log_message(t('log_writing_timelines', count=len(clip_ranges), formats=', '.join(TIMELINE_FORMATS)), "info")
+    cap = cv2.VideoCapture(video_path)
+    width, height = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+    base_name = os.path.splitext(video_name)[0]
+    report.settings['CLIP_OUTPUT_MODE'] = 'virtual'
+    try:
+        with report.stage('extract'):
+            paths = timeline.write_timelines(OUTPUT_FOLDER, base_name, video_path, clip_ranges, kill_times,
+                                             TIMELINE_FORMATS, fps=fps, duration=video_duration(video_path),
+                                             width=width, height=height, title=base_name)
+    except (OSError, ValueError) as e:
+        report.count('clips_failed', len(clip_ranges))
+        log_message(f"{t('log_error')}: {e}", "error")
+        return
+    
+    report.count('clips_written', len(clip_ranges))
+    report.mark('first_clip')
+    for path in paths:
+        log_message(f"{t('log_saved')}: {os.path.basename(path)}", "success")
+    # A virtual clip is its source and in/out points
+    for i, (clip_start, clip_end) in enumerate(clip_ranges, 1):
+        emit_event('clip', video=video_name, index=i, path=os.path.abspath(video_path),
+                   start=round(clip_start, 3), end=round(clip_end, 3), virtual=True)
+    update_progress(len(clip_ranges), len(clip_ranges), f"Clip {len(clip_ranges)}/{len(clip_ranges)}")
+    log_message(f"\n{t('log_clips_saved', count=len(clip_ranges))}", "success")
+
+def extract_clips(video_path, clip_ranges, fps, video_name, report=None, kill_times=(), cancelled=None):
+    """Extract planned (start, end) clips with FFmpeg, or write them as timelines in virtual mode.
+    cancelled: callable checked before every clip and before a finished clip is kept; once it returns
+    True no further clip is started or kept"""
+    if report is None:
+        report = PerfReport(video_name)
+    
+    if CLIP_OUTPUT_MODE == 'virtual':
+        write_virtual_clips(video_path, clip_ranges, kill_times, fps, video_name, report)
+        return
+    
+    log_message(f"\n{t('log_extracting_clips', count=len(clip_ranges))}", "info")
     
-    for i, (start_time, end_time) in enumerate(kill_segments, 1):
-        # Add buffer
-        clip_start = max(0, start_time - BUFFER_BEFORE)
-        clip_end = end_time + BUFFER_AFTER
+    reencode = CLIP_OUTPUT_MODE == 'reencode'
+    if reencode:
+        jobs, threads = plan_encode_jobs(len(clip_ranges))
+        # -map 0 keeps every audio track, each one takes its share of the size budget
+        audio_streams = audio_stream_count(video_path)
+        log_message(t('log_encode_reencode', codec=REENCODE_CODEC, preset=REENCODE_PRESET, crf=REENCODE_CRF,
+                      jobs=jobs, threads=threads), "success")
+        report.settings.update({'CLIP_OUTPUT_MODE': 'reencode', 'encode_jobs': jobs, 'encode_threads': threads})
+    else:
+        # Stream copy is I/O bound, clips go one at a time
+        jobs, threads = 1, 0
+        log_message("⚡ Video encoding: COPY mode (lossless, no re-encoding)", "success")
+    
+    # Stream copy starts at the keyframe before the seek point: name and time clips by that keyframe
+    # (plan_clip_intervals already moved the starts there, so clips do not overlap)
+    keyframes = stream_copy_keyframes(video_path)
+    
+    clips = []
+    for i, (clip_start, clip_end) in enumerate(clip_ranges, 1):
+        seek_time = clip_start
+        if keyframes is not None:
+            clip_start = keyframe_before(clip_start, keyframes)
+            seek_time = clip_start + KEYFRAME_SEEK_EPSILON
         
         # Add video name to filename
         base_name = os.path.splitext(video_name)[0]
         output_file = os.path.join(OUTPUT_FOLDER, f"{base_name}_kill_{i:03d}_{clip_start:.1f}s-{clip_end:.1f}s.mp4")
         
-        # FFmpeg command - FAST COPY method (lossless, no re-encoding)
         duration = clip_end - clip_start
         
         cmd = [
             'ffmpeg',
-            '-ss', str(clip_start),  # Seek before input (fast)
+            '-ss', str(seek_time),  # Seek before input (fast)
             '-i', video_path,
             '-t', str(duration),  # Duration
-            '-map', '0',  # Copy ALL streams (video + all audio channels)
-            '-c', 'copy',  # Copy without re-encoding (fast + lossless)
+            '-map', '0',  # Keep ALL streams (video + all audio channels)
+        ]
+        if reencode:
+            cmd += reencode_args(duration, threads, audio_streams)
+        else:
+            cmd += ['-c', 'copy']  # Copy without re-encoding (fast + lossless)
+        # Encoded under a temp name and renamed when done: no half-written clip under the final name
+        temp_file = f"{output_file[:-len('.mp4')]}.{uuid.uuid4().hex[:8]}.tmp.mp4"
+        cmd += [
             '-avoid_negative_ts', 'make_zero',  # Fix timestamp issues
             '-fflags', '+genpts',  # Regenerate timestamps
             '-y',  # Overwrite
-            output_file
+            temp_file
         ]
-        
-        # Log encoding method (only for first clip)
-        if i == 1:
-            log_message("⚡ Video encoding: COPY mode (lossless, no re-encoding)", "success")
-        
-        log_message(f"{t('log_extracting_clip', i=i, total=len(kill_segments))}: {clip_start:.1f}s - {clip_end:.1f}s", "info")
-        update_progress(i, len(kill_segments), f"Clip {i}/{len(kill_segments)}")
-        
-        # Extract clip
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            log_message(f"{t('log_saved')}: {os.path.basename(output_file)}", "success")
-        else:
-            log_message(f"{t('log_error')}: {os.path.basename(output_file)}", "error")
-            if result.stderr:
-                log_message(f"FFmpeg error: {result.stderr[:200]}", "error")
+        clips.append((i, clip_start, clip_end, output_file, temp_file, cmd))
+    
+    # Up to `jobs` encoders run at once; results are reported in clip order
+    pool = ThreadPoolExecutor(jobs, thread_name_prefix='encoder')
+    pending = deque()
+    abandoned = False
+    try:
+        for index, clip in enumerate(clips):
+            abandoned = cancelled is not None and cancelled()
+            if not abandoned:
+                i, clip_start, clip_end, _, _, cmd = clip
+                log_message(f"{t('log_extracting_clip', i=i, total=len(clips))}: {clip_start:.1f}s - {clip_end:.1f}s", "info")
+                # Stream copy is I/O bound and stays at normal priority
+                pending.append((clip, pool.submit(run_clip_command, cmd, report, reencode and ENCODE_LOW_PRIORITY)))
+            
+            while pending and (abandoned or len(pending) >= jobs or index == len(clips) - 1):
+                (i, clip_start, clip_end, output_file, temp_file, _), future = pending.popleft()
+                returncode, stderr = future.result()
+                if returncode == 0 and cancelled is not None and cancelled():
+                    abandoned = True
+                if returncode != 0 or abandoned:
+                    try:
+                        os.remove(temp_file)
+                    except OSError:
+                        pass
+                if abandoned:
+                    continue
+                update_progress(i, len(clips), f"Clip {i}/{len(clips)}")
+                
+                if returncode == 0:
+                    os.replace(temp_file, output_file)
+                    report.count('clips_written')
+                    report.mark('first_clip')
+                    log_message(f"{t('log_saved')}: {os.path.basename(output_file)}", "success")
+                    emit_event('clip', video=video_name, index=i, path=os.path.abspath(output_file),
+                               start=round(clip_start, 3), end=round(clip_end, 3))
+                else:
+                    report.count('clips_failed')
+                    log_message(f"{t('log_error')}: {os.path.basename(output_file)}", "error")
+                    if stderr:
+                        log_message(f"FFmpeg error: {stderr[:200]}", "error")
+            if abandoned:
+                break
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
     
-    log_message(f"\n{t('log_clips_saved', count=len(kill_segments))}", "success")
+    if not abandoned:
+        log_message(f"\n{t('log_clips_saved', count=len(clip_ranges))}", "success")
+
+def start_telemetry(counters=None):
+    """Start the resource telemetry writer configured by TELEMETRY_*, returns it (None when off).
+    counters: callable returning the counters to export, default the pipeline counters of this process"""
+    if TELEMETRY_FORMAT not in telemetry.TELEMETRY_FORMATS[1:]:
+        return None
+    path = TELEMETRY_PATH or os.path.join(OUTPUT_FOLDER, 'reports',
+                                          'telemetry.prom' if TELEMETRY_FORMAT == 'prometheus' else 'telemetry.jsonl')
+    log_message(f"{t('log_telemetry')}: {path} ({TELEMETRY_FORMAT}, {TELEMETRY_INTERVAL:g}s)", "info")
+    return telemetry.TelemetryWriter(path, TELEMETRY_FORMAT, TELEMETRY_INTERVAL, counters or pipeline_snapshot,
+                                     log_message).start()
+
+def finish_report(report):
+    """Log and export per-video performance report"""
+    report.finish()
+    report.log()
+    if PERF_REPORTS:
+        try:
+            report_path = report.export(os.path.join(OUTPUT_FOLDER, 'reports'))
+            log_message(f"{t('log_perf_saved')}: {report_path}", "info")
+        except OSError as e:
+            log_message(f"{t('log_error')}: {e}", "error")
 
-def process_video(video_path, template_path):
-    """Process single video"""
+def process_video(video_path, template_path, record_processed=True, batch=None, cancelled=None):
+    """Process single video (record_processed: add it to the local processed_videos.json,
+    batch: BatchReport the video counts towards, cancelled: callable, once it returns True the video
+    is abandoned between frames or clips and None is returned instead of the clip count)"""
     video_name = os.path.basename(video_path)
+    report = PerfReport(video_name)
     
     # Detect kills
-    kill_times, fps = detect_kills_in_video(video_path, template_path)
+    kill_times, fps = detect_kills_in_video(video_path, template_path, report, batch, cancelled)
+    if cancelled is not None and cancelled():
+        log_message(t('log_video_cancelled'), "warning")
+        return None
+    if fps <= 0:
+        # Skipped by the scan (error logged there); not recorded as processed, a fixed file is scanned again
+        report.finish()
+        if batch is not None:
+            batch.add(report, 0)
+        return 0
     
     if not kill_times:
         log_message(t('log_no_kills'), "warning")
+        finish_report(report)
+        if batch is not None:
+            batch.add(report, 0)
         # Save anyway to avoid reprocessing
-        save_processed_video(video_name, 0)
+        if record_processed:
+            save_processed_video(video_name, 0)
         return 0
     
-    # Merge consecutive kills
-    kill_segments = merge_close_kills(kill_times, MIN_KILL_GAP)
-    log_message(t('log_merged', kills=len(kill_times), segments=len(kill_segments)), "info")
+    # Merge consecutive kills, then plan the buffered clip ranges
+    clip_ranges = plan_clip_intervals(kill_times, video_duration(video_path), os.path.getsize(video_path), report, fps,
+                                      stream_copy_keyframes(video_path))
+    log_message(t('log_merged', kills=len(kill_times), segments=len(clip_ranges)), "info")
     
     # Extract clips
-    extract_clips(video_path, kill_segments, fps, video_name)
+    extract_clips(video_path, clip_ranges, fps, video_name, report, kill_times, cancelled)
+    if cancelled is not None and cancelled():
+        log_message(t('log_video_cancelled'), "warning")
+        return None
+    finish_report(report)
+    if batch is not None:
+        batch.add(report, len(clip_ranges))
     
     # Save as processed
-    save_processed_video(video_name, len(kill_segments))
+    if record_processed:
+        save_processed_video(video_name, len(clip_ranges))
     
-    return len(kill_segments)
+    return len(clip_ranges)
 
 def run_with_gui(gui):
     """Run with GUI"""
-    global gui_instance, config, INPUT_FOLDER, OUTPUT_FOLDER, TEMPLATE_PATH
-    global THRESHOLD, BUFFER_BEFORE, BUFFER_AFTER, MIN_KILL_GAP, FRAME_SKIP
-    global KILL_COOLDOWN, USE_EDGE_DETECTION, USE_COLOR_FILTER, USE_ROI
-    global ROI_X_START, ROI_Y_START, ROI_X_END, ROI_Y_END
-    global KILL_COLOR_LOWER, KILL_COLOR_UPPER, KILL_COLOR_LOWER2, KILL_COLOR_UPPER2
-    global MIN_COLOR_PIXELS, CANNY_THRESHOLD1, CANNY_THRESHOLD2
-    global current_language, language_texts, use_gpu
+    global gui_instance, current_language, language_texts, use_gpu
     
     gui_instance = gui
     
@@ -531,32 +2344,7 @@ def run_with_gui(gui):
     use_gpu = check_gpu_available()
     
     # Reload config (settings may have changed)
-    config = load_config()
-    
-    # Update global variables
-    INPUT_FOLDER = config['INPUT_FOLDER']
-    OUTPUT_FOLDER = config['OUTPUT_FOLDER']
-    TEMPLATE_PATH = get_resource_path(config['TEMPLATE_PATH'].lstrip('./'))
-    THRESHOLD = config['THRESHOLD']
-    BUFFER_BEFORE = config['BUFFER_BEFORE']
-    BUFFER_AFTER = config['BUFFER_AFTER']
-    MIN_KILL_GAP = config['MIN_KILL_GAP']
-    FRAME_SKIP = config['FRAME_SKIP']
-    KILL_COOLDOWN = config['KILL_COOLDOWN']
-    USE_EDGE_DETECTION = config['USE_EDGE_DETECTION']
-    USE_COLOR_FILTER = config['USE_COLOR_FILTER']
-    USE_ROI = config['USE_ROI']
-    ROI_X_START = config['ROI_X_START']
-    ROI_Y_START = config['ROI_Y_START']
-    ROI_X_END = config['ROI_X_END']
-    ROI_Y_END = config['ROI_Y_END']
-    KILL_COLOR_LOWER = np.array(config['KILL_COLOR_LOWER'])
-    KILL_COLOR_UPPER = np.array(config['KILL_COLOR_UPPER'])
-    KILL_COLOR_LOWER2 = np.array(config['KILL_COLOR_LOWER2'])
-    KILL_COLOR_UPPER2 = np.array(config['KILL_COLOR_UPPER2'])
-    MIN_COLOR_PIXELS = config['MIN_COLOR_PIXELS']
-    CANNY_THRESHOLD1 = config.get('CANNY_THRESHOLD1', 150)
-    CANNY_THRESHOLD2 = config.get('CANNY_THRESHOLD2', 250)
+    apply_config(load_config())
     
     # Start processing
     log_message("\n" + "="*60, "info")
@@ -564,41 +2352,57 @@ def run_with_gui(gui):
     log_message("="*60, "info")
     
     create_output_folder()
-    video_files = get_video_files(INPUT_FOLDER)
-    
-    if not video_files:
-        log_message(f"\n{t('log_no_videos', folder=INPUT_FOLDER)}", "warning")
-        log_message(f"{t('log_supported_formats')}: {', '.join(VIDEO_EXTENSIONS)}", "info")
-        log_message(t('log_add_videos', folder=INPUT_FOLDER), "info")
-        gui_instance.root.after(0, gui_instance.refresh_videos)
-        return
-    
-    log_message(f"\n{t('log_videos_found', count=len(video_files))}", "info")
-    for i, video in enumerate(video_files, 1):
-        log_message(f"   {i}. {os.path.basename(video)}", "info")
-    
-    # Process each video
-    total_clips = 0
-    for i, video_path in enumerate(video_files, 1):
+    telemetry_writer = start_telemetry()
+    try:
+        video_files = get_video_files(INPUT_FOLDER)
+        
+        if not video_files:
+            log_message(f"\n{t('log_no_videos', folder=INPUT_FOLDER)}", "warning")
+            log_message(f"{t('log_supported_formats')}: {', '.join(VIDEO_EXTENSIONS)}", "info")
+            log_message(t('log_add_videos', folder=INPUT_FOLDER), "info")
+            gui_instance.root.after(0, gui_instance.refresh_videos)
+            return
+        
+        log_message(f"\n{t('log_videos_found', count=len(video_files))}", "info")
+        for i, video in enumerate(video_files, 1):
+            log_message(f"   {i}. {os.path.basename(video)}", "info")
+        log_message(f"{t('log_batch_order')}: {BATCH_ORDER}", "info")
+        
+        # Process each video
+        total_clips = 0
+        batch = BatchReport(BATCH_ORDER, video_files)
+        for i, video_path in enumerate(video_files, 1):
+            log_message(f"\n{'='*60}", "info")
+            log_message(t('log_processing_video', i=i, total=len(video_files)), "info")
+            log_message(f"{'='*60}", "info")
+            update_progress(i-1, len(video_files), f"Video {i}/{len(video_files)}")
+            
+            clips_count = process_video(video_path, TEMPLATE_PATH, batch=batch)
+            total_clips += clips_count
+        
+        batch.finish()
+        batch.log()
+        if PERF_REPORTS:
+            try:
+                report_path = batch.export(os.path.join(OUTPUT_FOLDER, 'reports'))
+                log_message(f"{t('log_perf_saved')}: {report_path}", "info")
+            except OSError as e:
+                log_message(f"{t('log_error')}: {e}", "error")
+        
+        # Summary
         log_message(f"\n{'='*60}", "info")
-        log_message(t('log_processing_video', i=i, total=len(video_files)), "info")
+        log_message(t('log_completed'), "success")
         log_message(f"{'='*60}", "info")
-        update_progress(i-1, len(video_files), f"Video {i}/{len(video_files)}")
+        log_message(t('log_summary'), "info")
+        log_message(f"{t('log_processed_videos')}: {len(video_files)}", "info")
+        log_message(f"{t('log_total_clips')}: {total_clips}", "info")
+        log_message(f"{t('log_output_folder')}: {OUTPUT_FOLDER}", "info")
+        log_message(f"{'='*60}\n", "info")
+        update_progress(len(video_files), len(video_files), "Completed!")
         
-        clips_count = process_video(video_path, TEMPLATE_PATH)
-        total_clips += clips_count
-    
-    # Summary
-    log_message(f"\n{'='*60}", "info")
-    log_message(t('log_completed'), "success")
-    log_message(f"{'='*60}", "info")
-    log_message(t('log_summary'), "info")
-    log_message(f"{t('log_processed_videos')}: {len(video_files)}", "info")
-    log_message(f"{t('log_total_clips')}: {total_clips}", "info")
-    log_message(f"{t('log_output_folder')}: {OUTPUT_FOLDER}", "info")
-    log_message(f"{'='*60}\n", "info")
-    update_progress(len(video_files), len(video_files), "Completed!")
-    
-    # Refresh GUI
-    gui_instance.root.after(0, gui_instance.refresh_videos)
-    gui_instance.root.after(0, gui_instance.refresh_clips)
\ No newline at end of file
+        # Refresh GUI
+        gui_instance.root.after(0, gui_instance.refresh_videos)
+        gui_instance.root.after(0, gui_instance.refresh_clips)
+    finally:
+        if telemetry_writer is not None:
+            telemetry_writer.stop()
\ No newline at end of file
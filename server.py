@@ -0,0 +1,437 @@
+"""Local HTTP job service around process_video.
+
+Other tools (recording pipelines, dashboards) submit videos as jobs instead of
+driving the GUI. Jobs wait in a queue (higher priority first, then in
+submission order) and up to --max-jobs run at once, each in its own process:
+the engine keeps its settings in module globals, so a process per job is what
+lets two jobs run with different config overrides.
+Everything the GUI would receive (log lines, progress, kills, saved clips) is
+recorded as job events and streamed over Server-Sent Events; 'throughput'
+events carry the scan rate, x-realtime factor and ETA once a second.
+
+Endpoints:
+    POST   /jobs                {"path": "...", "config": {"FRAME_SKIP": 15}, "priority": 0}
+    GET    /jobs                all jobs
+    GET    /jobs/{id}           job state and result
+    GET    /jobs/{id}/clips     clips written by the job
+    GET    /jobs/{id}/events    event stream (text/event-stream), replays past events first
+    DELETE /jobs/{id}           cancel a queued or running job
+
+Usage:
+    python server.py --port 8765 --max-jobs 2
+    curl -X POST localhost:8765/jobs -d '{"path": "input_videos/match.mp4"}'
+    curl -N localhost:8765/jobs/1/events
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import main
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_MAX_JOBS = 1
+SSE_KEEPALIVE = 15.0  # Seconds between comment lines on an idle event stream
+
+class QueueOutput:
+    """Stand-in for the GUI inside a job process: forwards everything to the server"""
+    shows_preview = False
+
+    def __init__(self, events):
+        self.events = events
+
+    def add_log(self, message, level='info'):
+        self.events.put(('log', {'message': str(message).strip('\n'), 'level': level}))
+
+    def update_progress(self, current, total, text=""):
+        self.events.put(('progress', {'current': current, 'total': total, 'text': text}))
+
+    def update_preview(self, frame):
+        pass
+
+    def add_event(self, event, data):
+        self.events.put((event, data))
+
+def run_job(video_path, overrides, events):
+    """Job process entry point: apply the overrides and process one video"""
+    if hasattr(os, 'setpgrp'):
+        # Own process group: cancelling signals the FFmpeg children together with the job
+        os.setpgrp()
+    try:
+        cfg = dict(main.load_config())
+        cfg.update(overrides)
+        main.apply_config(cfg)
+        main.gui_instance = QueueOutput(events)
+        languages = main.load_languages()
+        main.language_texts = languages.get(cfg.get('LANGUAGE', 'tr'), languages['tr'])
+        main.use_gpu = main.check_gpu_available()
+        main.create_output_folder()
+        # Not written to processed_videos.json: concurrent jobs would overwrite each other's entries
+        clips = main.process_video(video_path, main.TEMPLATE_PATH, record_processed=False)
+        events.put(('result', {'clips': clips}))
+    except Exception as e:
+        events.put(('error', {'message': str(e), 'traceback': traceback.format_exc()}))
+
+def terminate_job_process(process):
+    """Stop a job process and the FFmpeg processes it started"""
+    if os.name == 'nt':
+        # /T takes the child processes along
+        subprocess.run(['taskkill', '/PID', str(process.pid), '/T', '/F'],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    else:
+        try:
+            # The job leads its own group (run_job), its pid is the group id.
+            # SIGKILL: on SIGTERM FFmpeg first finishes encoding what it has buffered
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            # Cancelled before run_job created the group
+            pass
+    if process.is_alive():
+        process.terminate()
+
+class Job:
+    """One submitted video, its events and outcome"""
+
+    def __init__(self, job_id, path, overrides, priority=0):
+        self.id = job_id
+        self.path = path
+        self.overrides = overrides
+        self.priority = priority
+        self.state = 'queued'
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.error = None
+        self.clip_count = None
+        self.kills = []
+        self.clips = []
+        self.progress = None
+        self.throughput = None
+        self.events = []
+        self.process = None
+
+    @property
+    def finished_state(self):
+        return self.state in ('done', 'failed', 'cancelled')
+
+    def summary(self):
+        return {
+            'id': self.id,
+            'path': self.path,
+            'config': self.overrides,
+            'priority': self.priority,
+            'state': self.state,
+            'submitted': self.submitted,
+            'started': self.started,
+            'finished': self.finished,
+            'seconds': round(self.finished - self.started, 3) if self.started and self.finished else None,
+            'progress': self.progress,
+            'throughput': self.throughput,
+            'kills': self.kills,
+            'clip_count': self.clip_count,
+            'clips': self.clips,
+            'error': self.error,
+        }
+
+class JobManager:
+    """Job queue with a concurrency limit; one process per running job"""
+
+    def __init__(self, max_jobs=DEFAULT_MAX_JOBS):
+        self.max_jobs = max(1, max_jobs)
+        self.jobs = {}
+        self.pending = queue.PriorityQueue()
+        self.changed = threading.Condition()
+        self.next_id = 1
+        self.slots = threading.Semaphore(self.max_jobs)
+        self.context = multiprocessing.get_context('spawn')
+        self.dispatcher = threading.Thread(target=self._dispatch, name='job-dispatcher', daemon=True)
+        self.dispatcher.start()
+
+    def submit(self, path, overrides, priority=0):
+        with self.changed:
+            sequence = self.next_id
+            job = Job(str(sequence), path, overrides, priority)
+            self.next_id += 1
+            self.jobs[job.id] = job
+            self._add_event(job, 'state', {'state': job.state})
+        self.pending.put((-priority, sequence, job))
+        return job
+
+    def get(self, job_id):
+        with self.changed:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        with self.changed:
+            return [job.summary() for job in self.jobs.values()]
+
+    def snapshot(self, job):
+        with self.changed:
+            return job.summary()
+
+    def counters(self):
+        """Job and pipeline totals for telemetry (the pipeline itself runs in the job processes)"""
+        with self.changed:
+            jobs = list(self.jobs.values())
+            counters = {f"jobs_{state}": sum(job.state == state for job in jobs)
+                        for state in ('queued', 'running', 'done', 'failed', 'cancelled')}
+            counters['kills'] = sum(len(job.kills) for job in jobs)
+            counters['clips_written'] = sum(len(job.clips) for job in jobs)
+        return counters
+
+    def cancel(self, job):
+        """Cancel a queued job or terminate a running one; False if it already finished"""
+        with self.changed:
+            if job.finished_state:
+                return False
+            if job.state == 'queued':
+                # The dispatcher skips it when its turn comes
+                self._finish(job, 'cancelled')
+                return True
+            process = job.process
+            self._finish(job, 'cancelled')
+        if process is not None:
+            terminate_job_process(process)
+        return True
+
+    def events_since(self, job, index, timeout):
+        """Events after `index`, waiting up to `timeout` for new ones; returns (events, job finished)"""
+        with self.changed:
+            if len(job.events) <= index and not job.finished_state:
+                self.changed.wait(timeout)
+            return job.events[index:], job.finished_state
+
+    def _add_event(self, job, event, data):
+        # Caller holds self.changed
+        job.events.append({'id': len(job.events), 'event': event, 'time': time.time(), 'data': data})
+        self.changed.notify_all()
+
+    def _finish(self, job, state, error=None):
+        # Caller holds self.changed
+        job.state = state
+        job.error = error
+        job.finished = time.time()
+        self._add_event(job, 'state', {'state': state, 'error': error})
+
+    def _dispatch(self):
+        while True:
+            # Take a slot first: a job submitted while all slots are busy can still overtake
+            self.slots.acquire()
+            _, _, job = self.pending.get()
+            with self.changed:
+                if job.state != 'queued':
+                    self.slots.release()
+                    continue
+                events = self.context.Queue()
+                job.process = self.context.Process(target=run_job, args=(job.path, job.overrides, events),
+                                                   name=f"job-{job.id}", daemon=True)
+                job.state = 'running'
+                job.started = time.time()
+                self._add_event(job, 'state', {'state': job.state})
+                job.process.start()
+            threading.Thread(target=self._relay, args=(job, events), name=f"job-{job.id}-relay", daemon=True).start()
+
+    def _relay(self, job, events):
+        """Move events from the job process into the job until the process exits"""
+        try:
+            while True:
+                try:
+                    event, data = events.get(timeout=0.5)
+                except queue.Empty:
+                    if not job.process.is_alive():
+                        # Drain what the process put before exiting
+                        try:
+                            event, data = events.get(timeout=0.5)
+                        except queue.Empty:
+                            break
+                    else:
+                        continue
+                self._record(job, event, data)
+            job.process.join()
+            with self.changed:
+                if job.finished_state:
+                    return
+                if job.clip_count is not None:
+                    self._finish(job, 'done')
+                else:
+                    self._finish(job, 'failed', job.error or f"Job process exited with code {job.process.exitcode}")
+        finally:
+            self.slots.release()
+
+    def _record(self, job, event, data):
+        with self.changed:
+            if event == 'progress':
+                job.progress = data
+            elif event == 'throughput':
+                job.throughput = data
+            elif event == 'kill':
+                job.kills.append(data['time'])
+            elif event == 'clip':
+                job.clips.append(data)
+            elif event == 'result':
+                job.clip_count = data['clips']
+            elif event == 'error':
+                job.error = data['message']
+            self._add_event(job, event, data)
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    server_version = 'EzClips'
+
+    @property
+    def manager(self):
+        return self.server.manager
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message):
+        self.send_json(status, {'error': message})
+
+    def route(self):
+        """(job or None, sub-resource) for /jobs[/{id}[/{name}]]; None if the path is not a job path"""
+        parts = [part for part in self.path.split('?', 1)[0].split('/') if part]
+        if not parts or parts[0] != 'jobs' or len(parts) > 3:
+            return None
+        if len(parts) == 1:
+            return None, None
+        return self.manager.get(parts[1]), (parts[2] if len(parts) == 3 else None)
+
+    def do_GET(self):
+        route = self.route()
+        if route is None:
+            return self.send_error_json(404, "Not found")
+        job, resource = route
+        if job is None and self.path.rstrip('/').split('?', 1)[0] == '/jobs':
+            return self.send_json(200, {'jobs': self.manager.list()})
+        if job is None:
+            return self.send_error_json(404, "Job not found")
+        if resource is None:
+            return self.send_json(200, self.manager.snapshot(job))
+        if resource == 'clips':
+            summary = self.manager.snapshot(job)
+            return self.send_json(200, {'id': job.id, 'state': summary['state'], 'clips': summary['clips']})
+        if resource == 'events':
+            return self.stream_events(job)
+        return self.send_error_json(404, "Not found")
+
+    def do_POST(self):
+        route = self.route()
+        if route != (None, None):
+            return self.send_error_json(404, "Not found")
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self.send_error_json(400, "Body must be JSON")
+        if not isinstance(request, dict):
+            return self.send_error_json(400, "Body must be a JSON object")
+
+        path = request.get('path')
+        overrides = request.get('config') or {}
+        if not isinstance(path, str) or not os.path.isfile(path):
+            return self.send_error_json(400, f"Video not found: {path}")
+        if not isinstance(overrides, dict):
+            return self.send_error_json(400, "config must be an object")
+        priority = request.get('priority', 0)
+        if not isinstance(priority, int) or isinstance(priority, bool):
+            return self.send_error_json(400, "priority must be an integer")
+        unknown = sorted(set(overrides) - set(self.server.config_keys))
+        if unknown:
+            return self.send_error_json(400, f"Unknown config keys: {', '.join(unknown)}")
+
+        job = self.manager.submit(os.path.abspath(path), overrides, priority)
+        self.send_json(201, self.manager.snapshot(job))
+
+    def do_DELETE(self):
+        route = self.route()
+        if route is None or route[1] is not None:
+            return self.send_error_json(404, "Not found")
+        job = route[0]
+        if job is None:
+            return self.send_error_json(404, "Job not found")
+        if not self.manager.cancel(job):
+            return self.send_error_json(409, f"Job already {job.state}")
+        self.send_json(200, self.manager.snapshot(job))
+
+    def stream_events(self, job):
+        """Server-Sent Events: past events first, then live ones until the job finishes"""
+        try:
+            index = int(self.headers.get('Last-Event-ID', -1)) + 1
+        except ValueError:
+            index = 0
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        last_write = time.time()
+        try:
+            while True:
+                events, finished = self.manager.events_since(job, index, SSE_KEEPALIVE)
+                for event in events:
+                    data = json.dumps(dict(event['data'], received=event['time']), ensure_ascii=False)
+                    self.wfile.write(f"id: {event['id']}\nevent: {event['event']}\ndata: {data}\n\n".encode('utf-8'))
+                index += len(events)
+                if events:
+                    last_write = time.time()
+                elif time.time() - last_write >= SSE_KEEPALIVE:
+                    self.wfile.write(b": keepalive\n\n")
+                    last_write = time.time()
+                self.wfile.flush()
+                if finished and not events:
+                    return
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away; the job keeps running
+            pass
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP job service for video processing")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="Bind address (default: localhost only)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--max-jobs', type=int, default=DEFAULT_MAX_JOBS, help="Jobs processed at the same time")
+    parser.add_argument('--verbose', action='store_true', help="Log every HTTP request")
+    args = parser.parse_args(argv)
+
+    config_keys = main.load_config().keys()
+    server = ThreadingHTTPServer((args.host, args.port), JobRequestHandler)
+    server.daemon_threads = True
+    server.manager = JobManager(args.max_jobs)
+    server.config_keys = config_keys
+    server.verbose = args.verbose
+    print(f"Listening on http://{args.host}:{server.server_address[1]} ({server.manager.max_jobs} concurrent jobs)", flush=True)
+    # Job processes and their FFmpeg children are children of this process, telemetry sees them all
+    telemetry_writer = main.start_telemetry(server.manager.counters)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for job in list(server.manager.jobs.values()):
+            server.manager.cancel(job)
+        if telemetry_writer is not None:
+            telemetry_writer.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,257 @@
+"""Resource telemetry for long batches.
+
+A background thread samples this process and its children (CPU, RSS, live
+FFmpeg processes) together with the pipeline counters on a fixed interval and
+writes them either as a Prometheus textfile (node_exporter textfile collector,
+replaced atomically on every sample) or as JSON lines (one object per sample,
+appended).
+
+psutil is optional. Without it the process CPU comes from os.times() and
+RSS, child CPU and the FFmpeg process count from /proc on Linux; elsewhere
+child CPU is counted once the children have exited and the other fields are
+left empty.
+"""
+import json
+import os
+import threading
+import time
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+TELEMETRY_FORMATS = ('off', 'prometheus', 'jsonl')
+METRIC_PREFIX = 'ezclips'
+# Counters turned into per-second rates
+RATE_COUNTERS = ('frames_decoded', 'frames_analyzed', 'clips_written')
+
+def _proc_rss(pid):
+    """Resident set size in bytes from /proc (Linux), None elsewhere"""
+    try:
+        with open(f"/proc/{pid}/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+def _proc_children(pid):
+    """(pid, name, CPU seconds) of the direct and indirect children from /proc (Linux), None elsewhere"""
+    try:
+        entries = [entry for entry in os.listdir('/proc') if entry.isdigit()]
+    except OSError:
+        return None
+    try:
+        clock_ticks = os.sysconf('SC_CLK_TCK')
+    except (ValueError, AttributeError):
+        return None
+    parents = {}
+    for entry in entries:
+        try:
+            with open(f"/proc/{entry}/stat", 'r') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # comm is in parentheses and may contain spaces
+        name = stat[stat.find('(') + 1:stat.rfind(')')]
+        # Fields after comm start at field 3 (state); ppid is field 4, utime/stime 14/15
+        fields = stat[stat.rfind(')') + 2:].split()
+        parents[int(entry)] = (int(fields[1]), name, (int(fields[11]) + int(fields[12])) / clock_ticks)
+    children = []
+    pending = [pid]
+    while pending:
+        parent = pending.pop()
+        for child, (ppid, name, cpu) in parents.items():
+            if ppid == parent:
+                children.append((child, name, cpu))
+                pending.append(child)
+    return children
+
+class ResourceProbe:
+    """CPU, memory and child-process readings of the current process"""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.process = psutil.Process(self.pid) if psutil else None
+        self.children = {}  # psutil.Process per child pid, cpu_percent needs the same object between calls
+        self.child_cpu = {}  # CPU seconds per child pid at the last /proc reading
+        self.last_times = os.times()
+        self.last_wall = time.perf_counter()
+        if self.process is not None:
+            self.process.cpu_percent(None)
+
+    def read(self):
+        now = time.perf_counter()
+        elapsed = max(now - self.last_wall, 1e-9)
+        if self.process is not None:
+            return self._read_psutil()
+
+        times = os.times()
+        cpu = (times.user + times.system - self.last_times.user - self.last_times.system) / elapsed * 100
+        children = _proc_children(self.pid)
+        if children is not None:
+            # Live children; a child started since the last reading counts all of its CPU time
+            child_cpu = {pid: seconds for pid, _, seconds in children}
+            children_cpu = sum(seconds - self.child_cpu.get(pid, 0.0) for pid, seconds in child_cpu.items()) / elapsed * 100
+            self.child_cpu = child_cpu
+        else:
+            # Exited (waited-for) children only
+            children_cpu = (times.children_user + times.children_system
+                            - self.last_times.children_user - self.last_times.children_system) / elapsed * 100
+        self.last_times, self.last_wall = times, now
+        ffmpeg = [pid for pid, name, _ in children if 'ffmpeg' in name.lower()] if children is not None else None
+        children_rss = sum(_proc_rss(pid) or 0 for pid, _, _ in children) if children is not None else None
+        return {
+            'cpu_percent': round(max(0.0, cpu), 1),
+            'rss_bytes': _proc_rss(self.pid),
+            'threads': threading.active_count(),
+            'children': len(children) if children is not None else None,
+            'ffmpeg_processes': len(ffmpeg) if ffmpeg is not None else None,
+            'children_cpu_percent': round(max(0.0, children_cpu), 1),
+            'children_rss_bytes': children_rss,
+        }
+
+    def _read_psutil(self):
+        self.last_wall = time.perf_counter()
+        try:
+            children = self.process.children(recursive=True)
+        except psutil.Error:
+            children = []
+        alive = {}
+        children_cpu = 0.0
+        children_rss = 0
+        ffmpeg = 0
+        for child in children:
+            tracked = self.children.get(child.pid, child)
+            try:
+                if child.pid in self.children:
+                    children_cpu += tracked.cpu_percent(None)
+                else:
+                    tracked.cpu_percent(None)
+                children_rss += tracked.memory_info().rss
+                if 'ffmpeg' in tracked.name().lower():
+                    ffmpeg += 1
+            except psutil.Error:
+                continue
+            alive[child.pid] = tracked
+        self.children = alive
+        return {
+            'cpu_percent': round(self.process.cpu_percent(None), 1),
+            'rss_bytes': self.process.memory_info().rss,
+            'threads': self.process.num_threads(),
+            'children': len(alive),
+            'ffmpeg_processes': ffmpeg,
+            'children_cpu_percent': round(max(0.0, children_cpu), 1),
+            'children_rss_bytes': children_rss,
+        }
+
+def _print_log(message, level='info'):
+    print(message)
+
+def format_prometheus(sample):
+    """Prometheus text exposition format of one sample"""
+    gauges = [
+        ('cpu_percent', "CPU usage of the EZClips process (percent of one core)"),
+        ('rss_bytes', "Resident memory of the EZClips process"),
+        ('threads', "Threads of the EZClips process"),
+        ('children', "Child processes"),
+        ('ffmpeg_processes', "Running FFmpeg child processes"),
+        ('children_cpu_percent', "CPU usage of the child processes (percent of one core)"),
+        ('children_rss_bytes', "Resident memory of the child processes"),
+        ('uptime_seconds', "Seconds since telemetry started"),
+    ]
+    lines = []
+    for name, help_text in gauges:
+        if sample.get(name) is None:
+            continue
+        lines += [f"# HELP {METRIC_PREFIX}_{name} {help_text}",
+                  f"# TYPE {METRIC_PREFIX}_{name} gauge",
+                  f"{METRIC_PREFIX}_{name} {sample[name]}"]
+    lines += [f"# HELP {METRIC_PREFIX}_pipeline_total Pipeline counters since start",
+              f"# TYPE {METRIC_PREFIX}_pipeline_total counter"]
+    for name, value in sorted(sample['counters'].items()):
+        label = name.replace('\\', '\\\\').replace('"', '\\"')
+        lines.append(f'{METRIC_PREFIX}_pipeline_total{{counter="{label}"}} {value}')
+    lines += [f"# HELP {METRIC_PREFIX}_pipeline_rate Pipeline counters per second over the last interval",
+              f"# TYPE {METRIC_PREFIX}_pipeline_rate gauge"]
+    for name, value in sorted(sample['rates'].items()):
+        lines.append(f'{METRIC_PREFIX}_pipeline_rate{{counter="{name}"}} {value}')
+    lines.append(f"{METRIC_PREFIX}_last_sample_timestamp_seconds {sample['timestamp']}")
+    return '\n'.join(lines) + '\n'
+
+class TelemetryWriter:
+    """Samples resources and pipeline counters every `interval` seconds on a background thread.
+    log: callable(message, level) for failed samples, default print"""
+
+    def __init__(self, path, fmt, interval, counters=None, log=None):
+        if fmt not in TELEMETRY_FORMATS[1:]:
+            raise ValueError(f"Unknown telemetry format: {fmt}")
+        self.path = path
+        self.fmt = fmt
+        self.interval = max(0.1, interval)
+        self.counters = counters or (lambda: {})
+        self.log = log or _print_log
+        self.failing = False
+        self.probe = ResourceProbe()
+        self.started = time.perf_counter()
+        self.last_counters = dict(self.counters())
+        self.last_sample = self.started
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='telemetry', daemon=True)
+
+    def sample(self):
+        now = time.perf_counter()
+        elapsed = max(now - self.last_sample, 1e-9)
+        counters = dict(self.counters())
+        rates = {name: round((counters.get(name, 0) - self.last_counters.get(name, 0)) / elapsed, 2)
+                 for name in RATE_COUNTERS}
+        self.last_counters, self.last_sample = counters, now
+        return dict(self.probe.read(), timestamp=round(time.time(), 3),
+                    uptime_seconds=round(now - self.started, 1), counters=counters, rates=rates)
+
+    def write(self, sample):
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        if self.fmt == 'jsonl':
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(sample) + '\n')
+            return
+        # The textfile collector may read at any time: never expose a half-written file
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(format_prometheus(sample))
+        os.replace(temp_path, self.path)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._write_sample()
+
+    def _write_sample(self):
+        try:
+            self.write(self.sample())
+        except Exception as e:
+            # Telemetry must never stop a batch or itself: report once per failure streak and keep sampling
+            if not self.failing:
+                self.log(f"Telemetry sample failed: {type(e).__name__}: {e}", "warning")
+            self.failing = True
+            return
+        if self.failing:
+            self.log("Telemetry sampling recovered", "info")
+        self.failing = False
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop sampling and write a final sample"""
+        self._stop.set()
+        self._thread.join()
+        self._write_sample()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
@@ -0,0 +1,157 @@
+"""Virtual clip outputs: kill timelines and edit lists instead of clip files.
+
+Every writer references the source video by path and in/out points, no video
+bytes are copied, so the output of a long VOD stays a few kilobytes and takes
+no extraction time.
+
+    csv       one row per clip with its kills
+    json      kill timeline and clips of the video
+    edl       CMX3600 edit decision list (non-drop frame timecode)
+    fcpxml    Final Cut Pro XML 1.9 project with one asset-clip per clip
+    ffconcat  FFmpeg concat playlist (ffplay -safe 0 -f concat -i ...)
+    m3u       playlist with VLC start/stop options
+
+Clips are (start, end) seconds in the source; EDL and FCPXML snap them to
+whole frames of the source frame rate.
+"""
+import csv
+import json
+import os
+import xml.etree.ElementTree as ET
+from fractions import Fraction
+from pathlib import Path
+
+TIMELINE_FORMATS = ('csv', 'json', 'edl', 'fcpxml', 'ffconcat', 'm3u')
+TIMELINE_EXTENSIONS = {'csv': '.csv', 'json': '.json', 'edl': '.edl', 'fcpxml': '.fcpxml',
+                       'ffconcat': '.ffconcat', 'm3u': '.m3u'}
+# Record timecode of the first EDL event, editors expect program time to start at one hour
+EDL_RECORD_START = 3600
+
+def clip_kills(clips, kill_times):
+    """Kill times inside each (start, end) clip"""
+    return [[k for k in kill_times if start <= k <= end] for start, end in clips]
+
+def frame_duration(fps):
+    """Exact frame duration, e.g. 1001/30000 for 29.97 fps"""
+    return 1 / Fraction(fps).limit_denominator(1001)
+
+def to_frames(seconds, fps):
+    return int(round(seconds * fps))
+
+def timecode(frames, fps):
+    """Non-drop frame timecode HH:MM:SS:FF counted at the nominal (rounded) rate"""
+    rate = max(1, int(round(fps)))
+    seconds, frame = divmod(frames, rate)
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}:{frame:02d}"
+
+def rational_time(frames, fps):
+    """FCPXML time value of a frame count, e.g. '1001/30000s'"""
+    value = frames * frame_duration(fps)
+    return f"{value.numerator}s" if value.denominator == 1 else f"{value.numerator}/{value.denominator}s"
+
+def write_csv(path, source, clips, kill_times, **_):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['clip', 'start', 'end', 'duration', 'kills', 'kill_times', 'source'])
+        for i, ((start, end), kills) in enumerate(zip(clips, clip_kills(clips, kill_times)), 1):
+            writer.writerow([i, f"{start:.3f}", f"{end:.3f}", f"{end - start:.3f}", len(kills),
+                             ' '.join(f"{k:.3f}" for k in kills), source])
+
+def write_json(path, source, clips, kill_times, fps=0.0, duration=0.0, **_):
+    data = {
+        'source': source,
+        'fps': round(fps, 3),
+        'duration': round(duration, 3),
+        'kills': [round(k, 3) for k in kill_times],
+        'clips': [{'clip': i, 'start': round(start, 3), 'end': round(end, 3),
+                   'duration': round(end - start, 3), 'kills': [round(k, 3) for k in kills]}
+                  for i, ((start, end), kills) in enumerate(zip(clips, clip_kills(clips, kill_times)), 1)],
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+def write_edl(path, source, clips, kill_times, fps=0.0, title='', **_):
+    fps = fps or 30.0
+    name = os.path.basename(source)
+    lines = [f"TITLE: {title or os.path.splitext(name)[0]}", "FCM: NON-DROP FRAME", ""]
+    record = EDL_RECORD_START * int(round(fps))
+    for i, (start, end) in enumerate(clips, 1):
+        source_in, source_out = to_frames(start, fps), to_frames(end, fps)
+        length = source_out - source_in
+        # Reel AX (auxiliary source) with the file named in comments, as the NLEs export it
+        lines += [f"{i:03d}  AX       B     C        {timecode(source_in, fps)} {timecode(source_out, fps)} "
+                  f"{timecode(record, fps)} {timecode(record + length, fps)}",
+                  f"* FROM CLIP NAME: {name}",
+                  f"* SOURCE FILE: {source}",
+                  ""]
+        record += length
+    with open(path, 'w', encoding='utf-8', newline='\r\n') as f:
+        f.write('\n'.join(lines))
+
+def write_fcpxml(path, source, clips, kill_times, fps=0.0, duration=0.0, width=0, height=0, title='', **_):
+    fps = fps or 30.0
+    name = os.path.basename(source)
+    title = title or os.path.splitext(name)[0]
+    root = ET.Element('fcpxml', version='1.9')
+    resources = ET.SubElement(root, 'resources')
+    ET.SubElement(resources, 'format', id='r1', frameDuration=rational_time(1, fps),
+                  width=str(width), height=str(height))
+    asset = ET.SubElement(resources, 'asset', id='r2', name=name, start='0s',
+                          duration=rational_time(to_frames(duration, fps), fps),
+                          hasVideo='1', hasAudio='1', format='r1')
+    ET.SubElement(asset, 'media-rep', kind='original-media', src=Path(source).as_uri())
+    event = ET.SubElement(ET.SubElement(root, 'library'), 'event', name=title)
+    project = ET.SubElement(event, 'project', name=f"{title} kills")
+    sequence = ET.SubElement(project, 'sequence', format='r1', tcStart='0s', tcFormat='NDF')
+    spine = ET.SubElement(sequence, 'spine')
+    offset = 0
+    for i, (start, end) in enumerate(clips, 1):
+        source_in, source_out = to_frames(start, fps), to_frames(end, fps)
+        ET.SubElement(spine, 'asset-clip', ref='r2', name=f"{title} kill {i:03d}",
+                      offset=rational_time(offset, fps), start=rational_time(source_in, fps),
+                      duration=rational_time(source_out - source_in, fps), format='r1', tcFormat='NDF')
+        offset += source_out - source_in
+    sequence.set('duration', rational_time(offset, fps))
+    ET.indent(root)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE fcpxml>\n')
+        f.write(ET.tostring(root, encoding='unicode'))
+        f.write('\n')
+
+def write_ffconcat(path, source, clips, kill_times, **_):
+    # Absolute paths are "unsafe" for the concat demuxer: play with -safe 0
+    quoted = source.replace("'", "'\\''")
+    lines = ["ffconcat version 1.0"]
+    for start, end in clips:
+        lines += [f"file '{quoted}'", f"inpoint {start:.3f}", f"outpoint {end:.3f}"]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+def write_m3u(path, source, clips, kill_times, title='', **_):
+    title = title or os.path.splitext(os.path.basename(source))[0]
+    lines = ["#EXTM3U"]
+    for i, (start, end) in enumerate(clips, 1):
+        lines += [f"#EXTINF:{end - start:.3f},{title} kill {i:03d}",
+                  f"#EXTVLCOPT:start-time={start:.3f}",
+                  f"#EXTVLCOPT:stop-time={end:.3f}",
+                  source]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+WRITERS = {'csv': write_csv, 'json': write_json, 'edl': write_edl, 'fcpxml': write_fcpxml,
+           'ffconcat': write_ffconcat, 'm3u': write_m3u}
+
+def write_timelines(folder, base_name, source, clips, kill_times, formats=TIMELINE_FORMATS, **info):
+    """Write the requested formats as {folder}/{base_name}_timeline.{ext}, returns the written paths.
+    info: fps, duration, width, height and title of the source, used where the format needs them"""
+    unknown = [fmt for fmt in formats if fmt not in WRITERS]
+    if unknown:
+        raise ValueError(f"Unknown timeline format: {', '.join(unknown)}")
+    source = os.path.abspath(source)
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for fmt in formats:
+        path = os.path.join(folder, f"{base_name}_timeline{TIMELINE_EXTENSIONS[fmt]}")
+        WRITERS[fmt](path, source, clips, kill_times, **info)
+        paths.append(path)
+    return paths
@@ -0,0 +1,165 @@
+"""Automatic FRAME_SKIP / THRESHOLD / MIN_COLOR_PIXELS tuner.
+
+Sweeps detection settings against a labeled sample (or a synthetic fixture),
+measures recall and scan speed and recommends the fastest settings that still
+reach the target recall.
+
+Labels file format:
+    {"video": "sample.mp4", "kills": [12.4, 31.0, 58.7]}
+
+Usage:
+    python tune.py --labels sample_labels.json --target-recall 0.95
+    python tune.py --synthetic --write
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+import benchmark
+import main
+
+DEFAULT_FRAME_SKIPS = [15, 30, 60, 90, 120, 180, 240]
+DEFAULT_THRESHOLDS = [0.45, 0.5, 0.55, 0.6]
+DEFAULT_MIN_COLOR_PIXELS = [100, 150, 200]
+
+def load_labels(path):
+    """Load labeled sample, returns (video_path, events)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    video_path = data['video']
+    if not os.path.isabs(video_path):
+        video_path = os.path.join(os.path.dirname(os.path.abspath(path)), video_path)
+    events = [{'time': float(k), 'border': 'red'} for k in data['kills']]
+    return video_path, events
+
+def build_synthetic_fixture(workdir, duration, kills, seed):
+    """Generate a synthetic 1080p fixture, returns (video_path, events)"""
+    rng = np.random.default_rng(seed)
+    events = benchmark.generate_events(duration, kills, 0.25, 0.2, rng)
+    video_path = os.path.join(workdir, f"tune_fixture_{int(duration)}s_{kills}k_{seed}.mp4")
+    if not os.path.exists(video_path):
+        template = cv2.imread(main.list_template_files(main.TEMPLATE_PATH)[0])
+        templates = {'red': template, 'gray': benchmark.make_gray_template(template)}
+        background = benchmark.build_background('gameplay', 1920, 1080, rng)
+        benchmark.generate_video(video_path, 1920, 1080, duration, events, background, templates)
+    return video_path, events
+
+def evaluate(video_path, events, duration, base_config, frame_skip, threshold, min_color_pixels):
+    """Run one scan with the given settings, returns result dict"""
+    cfg = dict(base_config)
+    cfg.update({'FRAME_SKIP': frame_skip, 'THRESHOLD': threshold, 'MIN_COLOR_PIXELS': min_color_pixels})
+    main.apply_config(cfg)
+
+    started = time.perf_counter()
+    kill_times, fps = main.detect_kills_in_video(video_path, main.TEMPLATE_PATH)
+    scan_time = time.perf_counter() - started
+
+    tolerance = frame_skip / fps + 0.1 if fps else 0.5
+    tp, fp, fn = benchmark.score_detections(kill_times, events, tolerance)
+    return {
+        'FRAME_SKIP': frame_skip,
+        'THRESHOLD': threshold,
+        'MIN_COLOR_PIXELS': min_color_pixels,
+        'scan_seconds': round(scan_time, 3),
+        'x_realtime': round(duration / scan_time, 2) if scan_time else 0.0,
+        'recall': round(tp / (tp + fn), 3) if tp + fn else 1.0,
+        'precision': round(tp / (tp + fp), 3) if tp + fp else 1.0,
+    }
+
+def sweep(video_path, events, duration, base_config, frame_skips, thresholds, min_pixels,
+          target_recall, min_precision):
+    """Sweep settings, fastest FRAME_SKIP first; returns (results, best)"""
+    results = []
+    best = None
+    # Most permissive combination first: if it misses the target, the rest of
+    # that FRAME_SKIP cannot reach it either
+    combos = sorted(itertools.product(thresholds, min_pixels))
+    for frame_skip in sorted(frame_skips, reverse=True):
+        for threshold, min_color_pixels in combos:
+            result = evaluate(video_path, events, duration, base_config,
+                              frame_skip, threshold, min_color_pixels)
+            results.append(result)
+            print(f"FRAME_SKIP={frame_skip:<4} THRESHOLD={threshold:<5} MIN_COLOR_PIXELS={min_color_pixels:<4} "
+                  f"{result['x_realtime']:>7.2f}x  recall {result['recall']:.3f}  precision {result['precision']:.3f}")
+
+            if result['recall'] < target_recall:
+                if (threshold, min_color_pixels) == combos[0]:
+                    break
+                continue
+            if result['precision'] < min_precision:
+                continue
+            if (best is None or result['x_realtime'] > best['x_realtime'] or
+                    (result['x_realtime'] == best['x_realtime'] and result['precision'] > best['precision'])):
+                best = result
+    return results, best
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Tune FRAME_SKIP / THRESHOLD / MIN_COLOR_PIXELS")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--labels', help="Labeled sample JSON ({\"video\": ..., \"kills\": [...]})")
+    source.add_argument('--synthetic', action='store_true', help="Use a generated synthetic fixture")
+    parser.add_argument('--duration', type=float, default=60.0, help="Synthetic fixture length (seconds)")
+    parser.add_argument('--kills', type=int, default=12, help="Synthetic fixture kill events")
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--frame-skips', nargs='+', type=int, default=DEFAULT_FRAME_SKIPS)
+    parser.add_argument('--thresholds', nargs='+', type=float, default=DEFAULT_THRESHOLDS)
+    parser.add_argument('--min-color-pixels', nargs='+', type=int, default=DEFAULT_MIN_COLOR_PIXELS)
+    parser.add_argument('--target-recall', type=float, default=0.95)
+    parser.add_argument('--min-precision', type=float, default=0.0)
+    parser.add_argument('--write', action='store_true', help="Write recommended settings to config.json")
+    parser.add_argument('--json', dest='json_path', help="Write all results to JSON file")
+    args = parser.parse_args(argv)
+
+    base_config = dict(main.load_config())
+    main.apply_config(base_config)
+
+    if args.labels:
+        video_path, events = load_labels(args.labels)
+    else:
+        workdir = os.path.join(tempfile.gettempdir(), 'ezclips_tune')
+        os.makedirs(workdir, exist_ok=True)
+        print("Preparing synthetic fixture...")
+        video_path, events = build_synthetic_fixture(workdir, args.duration, args.kills, args.seed)
+
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    if not fps:
+        print(f"Could not open video: {video_path}")
+        return 1
+    duration = total_frames / fps
+
+    results, best = sweep(video_path, events, duration, base_config, args.frame_skips,
+                          args.thresholds, args.min_color_pixels, args.target_recall, args.min_precision)
+    main.apply_config(base_config)
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({'video': video_path, 'target_recall': args.target_recall,
+                       'recommended': best, 'results': results}, f, indent=2)
+
+    if best is None:
+        print(f"\nNo setting reached recall {args.target_recall:.2f}. Try lower FRAME_SKIP or THRESHOLD values.")
+        return 1
+
+    print(f"\nRecommended: FRAME_SKIP={best['FRAME_SKIP']} THRESHOLD={best['THRESHOLD']} "
+          f"MIN_COLOR_PIXELS={best['MIN_COLOR_PIXELS']} "
+          f"({best['x_realtime']:.2f}x realtime, recall {best['recall']:.3f}, precision {best['precision']:.3f})")
+
+    if args.write:
+        for key in ('FRAME_SKIP', 'THRESHOLD', 'MIN_COLOR_PIXELS'):
+            base_config[key] = best[key]
+        config_path = main.save_config(base_config)
+        print(f"Settings written to {config_path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())